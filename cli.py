@@ -0,0 +1,129 @@
+"""
+Comandos de mantenimiento.
+
+    python cli.py import airports aeropuertos.csv
+    python cli.py import connections conexiones.xlsx --chunk-size 10000
+    python cli.py snapshot --output graph.snapshot
+    python cli.py backfill-stats
+    python cli.py upgrade-db --dry-run
+"""
+import argparse
+import sys
+
+from db.session import SessionLocal
+import models.user       # noqa: F401
+import models.airport    # noqa: F401
+import models.connection # noqa: F401
+import models.route      # noqa: F401
+import models.user_stats # noqa: F401
+
+
+def cmd_import(args: argparse.Namespace) -> int:
+    from services.import_service import import_file
+
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as fh:
+            result = import_file(
+                db,
+                kind=args.kind,
+                source=fh,
+                filename=args.path,
+                chunk_size=args.chunk_size,
+            )
+    finally:
+        db.close()
+
+    print(
+        f"{result.kind}: {result.rows_imported}/{result.rows_read} filas importadas, "
+        f"{result.rows_rejected} rechazadas en {result.elapsed_seconds:.2f}s "
+        f"({result.rows_per_second:.0f} filas/s)"
+    )
+    for err in result.errors:
+        print(f"  {err}", file=sys.stderr)
+    return 0
+
+
+def cmd_snapshot(args: argparse.Namespace) -> int:
+    import time
+
+    from core.config import settings
+    from services.graph_snapshot import write_snapshot
+
+    path = args.output or settings.GRAPH_SNAPSHOT_PATH
+    if not path:
+        print("Indica --output o configura GRAPH_SNAPSHOT_PATH", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        n_airports, n_connections = write_snapshot(db, path)
+    finally:
+        db.close()
+
+    print(
+        f"Snapshot {path}: {n_airports} aeropuertos, {n_connections} conexiones "
+        f"en {time.perf_counter() - started:.2f}s"
+    )
+    return 0
+
+
+def cmd_backfill_stats(args: argparse.Namespace) -> int:
+    from services.user_stats_service import backfill_user_stats
+
+    db = SessionLocal()
+    try:
+        n_users, n_airports = backfill_user_stats(db)
+    finally:
+        db.close()
+
+    print(f"Estadísticas recalculadas: {n_users} usuarios, {n_airports} filas de aeropuertos")
+    return 0
+
+
+def cmd_upgrade_db(args: argparse.Namespace) -> int:
+    from db.session import engine
+    from db.upgrade import upgrade_schema
+
+    statements = upgrade_schema(engine, dry_run=args.dry_run)
+    for statement in statements:
+        print(f"{statement};")
+    if not statements:
+        print("El esquema ya está al día")
+    elif not args.dry_run:
+        print(f"{len(statements)} cambios de esquema aplicados")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", help="Importa aeropuertos o conexiones desde CSV/XLSX")
+    p_import.add_argument("kind", choices=["airports", "connections"])
+    p_import.add_argument("path")
+    p_import.add_argument("--chunk-size", type=int, default=5000)
+    p_import.set_defaults(func=cmd_import)
+
+    p_snapshot = sub.add_parser("snapshot", help="Genera el snapshot binario del grafo")
+    p_snapshot.add_argument("--output", default=None)
+    p_snapshot.set_defaults(func=cmd_snapshot)
+
+    p_stats = sub.add_parser("backfill-stats", help="Recalcula las estadísticas por usuario")
+    p_stats.set_defaults(func=cmd_backfill_stats)
+
+    p_upgrade = sub.add_parser("upgrade-db", help="Añade columnas y tablas nuevas a una BD existente")
+    p_upgrade.add_argument("--dry-run", action="store_true", help="Solo muestra el SQL")
+    p_upgrade.set_defaults(func=cmd_upgrade_db)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
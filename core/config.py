@@ -10,6 +10,46 @@ class Settings(BaseSettings):
 
     DATABASE_URL: str = "sqlite:///./complejidad.db"
 
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_PRE_PING: bool = True
+
+    # Las consultas más lentas que esto se registran con sus parámetros.
+    SQL_SLOW_QUERY_MS: float = 200.0
+
+    # Snapshot binario del grafo (python cli.py snapshot). Vacío = usar la BD.
+    GRAPH_SNAPSHOT_PATH: str = ""
+
+    # Modo corredor: desvíos relativos que se prueban en orden hasta hallar ruta.
+    CORRIDOR_DETOUR_STEPS: list[float] = [0.15, 0.35, 0.75, 1.5]
+
+    # Itinerarios: orden exacto (Held-Karp) hasta este número de aeropuertos;
+    # por encima, heurística con presupuesto de tiempo para 2-opt.
+    ITINERARY_EXACT_MAX_AIRPORTS: int = 12
+    ITINERARY_TIME_BUDGET_MS: float = 2000.0
+
+    # Cola de trabajos de rutas (POST /routes/jobs).
+    ROUTE_JOB_WORKERS: int = 2
+    ROUTE_JOB_MAX_QUEUE: int = 100
+    ROUTE_JOB_PER_USER: int = 3
+    # Jobs de un mismo usuario ejecutándose a la vez; siempre queda por
+    # debajo de ROUTE_JOB_WORKERS para que un usuario no ocupe todo el pool.
+    ROUTE_JOB_MAX_RUNNING_PER_USER: int = 1
+    ROUTE_JOB_TIMEOUT_S: float = 120.0
+    ROUTE_JOB_RESULT_TTL_S: float = 3600.0
+    ROUTE_JOB_MAX_WAIT_S: float = 30.0
+
+    # Token para los endpoints /admin. Vacío = endpoints de admin deshabilitados.
+    ADMIN_TOKEN: str = ""
+
+    # Perfilado de /routes/calculate: se guarda el perfil de las peticiones
+    # más lentas que PROFILE_SLOW_MS (o las que envían X-Profile-Token).
+    PROFILING_ENABLED: bool = False
+    PROFILE_SLOW_MS: float = 2000.0
+    PROFILE_DIR: str = "./profiles"
+    PROFILE_MAX_FILES: int = 200
+
     class Config:
         env_file = ".env"
 
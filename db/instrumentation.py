@@ -0,0 +1,197 @@
+"""
+Contabilidad de SQL por petición y log de consultas lentas.
+
+Los listeners del engine suman sentencias, filas y tiempo en el objeto
+RequestSQLStats de la petición en curso (ContextVar), que crea
+SQLStatsMiddleware. TimedQueuePool mide además cuánto se espera para
+obtener una conexión del pool.
+
+Filas: en DML, las afectadas. En SELECT, las que informa el driver en
+cursor.rowcount (p. ej. psycopg2); si no lo informa (-1, como sqlite3 o
+pyodbc), las entidades ORM cargadas en la sesión. En ese caso los SELECT
+de columnas sueltas no suman filas.
+"""
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from core.config import settings
+
+logger = logging.getLogger("sql")
+
+_MAX_LOGGED_PARAMS = 500
+
+
+class RequestSQLStats:
+    __slots__ = (
+        "statements",
+        "rows",
+        "sql_ms",
+        "slow_statements",
+        "pool_wait_ms",
+        "select_rowcount_known",
+    )
+
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+        self.sql_ms = 0.0
+        self.slow_statements = 0
+        self.pool_wait_ms = 0.0
+        # Si el último SELECT ya sumó sus filas vía cursor.rowcount.
+        self.select_rowcount_known = False
+
+
+_request_stats: ContextVar[Optional[RequestSQLStats]] = ContextVar(
+    "request_sql_stats", default=None
+)
+
+
+class PoolWaitStats:
+    """Acumulado del proceso de esperas al sacar conexiones del pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, wait_ms: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.total_ms += wait_ms
+            self.max_ms = max(self.max_ms, wait_ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            avg = self.total_ms / self.checkouts if self.checkouts else 0.0
+            return {
+                "checkouts": self.checkouts,
+                "avg_wait_ms": round(avg, 3),
+                "max_wait_ms": round(self.max_ms, 3),
+                "total_wait_ms": round(self.total_ms, 3),
+            }
+
+
+pool_wait_stats = PoolWaitStats()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que mide el tiempo de checkout (espera + conexión nueva)."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait_ms = (time.perf_counter() - started) * 1000
+            pool_wait_stats.record(wait_ms)
+            stats = _request_stats.get()
+            if stats is not None:
+                stats.pool_wait_ms += wait_ms
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._sql_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_sql_started", None)
+    if started is None:
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.sql_ms += elapsed_ms
+        is_dml = context.isinsert or context.isupdate or context.isdelete
+        rowcount = cursor.rowcount if cursor.rowcount is not None else -1
+        if not is_dml and cursor.description is not None:
+            stats.select_rowcount_known = rowcount >= 0
+        stats.rows += max(rowcount, 0)
+
+    if elapsed_ms >= settings.SQL_SLOW_QUERY_MS:
+        if stats is not None:
+            stats.slow_statements += 1
+        logger.warning(
+            "Consulta lenta (%.1f ms): %s | params=%s",
+            elapsed_ms,
+            " ".join(statement.split()),
+            repr(parameters)[:_MAX_LOGGED_PARAMS],
+        )
+
+
+def _loaded_as_persistent(session, instance):
+    stats = _request_stats.get()
+    if stats is not None and not stats.select_rowcount_known:
+        stats.rows += 1
+
+
+def install_sql_instrumentation(engine: Engine) -> None:
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def install_orm_row_counting(session_factory: sessionmaker) -> None:
+    """
+    Cuenta las entidades cargadas cuando el driver no informa las filas
+    de un SELECT.
+    """
+    event.listen(session_factory, "loaded_as_persistent", _loaded_as_persistent)
+
+
+class SQLStatsMiddleware:
+    """
+    Middleware ASGI que abre un RequestSQLStats por petición, lo resume en
+    el log y lo devuelve en las cabeceras X-SQL-*.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestSQLStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers += [
+                    (b"x-sql-statements", str(stats.statements).encode()),
+                    (b"x-sql-rows", str(stats.rows).encode()),
+                    (b"x-sql-time-ms", f"{stats.sql_ms:.1f}".encode()),
+                    (b"x-db-pool-wait-ms", f"{stats.pool_wait_ms:.1f}".encode()),
+                ]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _request_stats.reset(token)
+            logger.debug(
+                "%s %s: %d sentencias, %d filas, %.1f ms SQL (%d lentas), "
+                "%.1f ms espera pool, %.1f ms total",
+                scope.get("method"),
+                scope.get("path"),
+                stats.statements,
+                stats.rows,
+                stats.sql_ms,
+                stats.slow_statements,
+                stats.pool_wait_ms,
+                (time.perf_counter() - started) * 1000,
+            )
@@ -1,15 +1,27 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from core.config import settings
+from db.instrumentation import (
+    TimedQueuePool,
+    install_orm_row_counting,
+    install_sql_instrumentation,
+)
 
 engine = create_engine(
     settings.DATABASE_URL,
     future=True,
+    poolclass=TimedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
     connect_args={
         "cafile": "/etc/ssl/certs/ca-certificates.crt",
     },
 )
+install_sql_instrumentation(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+install_orm_row_counting(SessionLocal)
 
 def get_db():
     db = SessionLocal()
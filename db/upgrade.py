@@ -0,0 +1,66 @@
+"""
+Cambios de esquema pendientes en bases de datos ya existentes.
+
+El proyecto no usa herramienta de migraciones; upgrade_schema compara los
+modelos con la BD y aplica solo lo que falta, así que se puede ejecutar
+más de una vez (python cli.py upgrade-db).
+"""
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn, CreateIndex, CreateTable
+
+from models.route import RouteCalculated
+from models.user_stats import UserAirportStats, UserRouteStats
+
+# Columnas añadidas a tablas existentes.
+_ADDED_COLUMNS = [
+    (RouteCalculated.__table__, ("max_stops", "avg_concurrency")),
+]
+
+# Tablas nuevas (se crean con sus índices).
+_ADDED_TABLES = [
+    UserRouteStats.__table__,
+    UserAirportStats.__table__,
+]
+
+
+def pending_schema_changes(engine: Engine) -> list[str]:
+    """
+    Sentencias DDL que faltan aplicar, en el dialecto de `engine`.
+    """
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    statements: list[str] = []
+
+    for table, column_names in _ADDED_COLUMNS:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for name in column_names:
+            if name in existing:
+                continue
+            column_ddl = CreateColumn(table.c[name]).compile(dialect=engine.dialect)
+            # ADD sin COLUMN: lo aceptan SQL Server, PostgreSQL y SQLite.
+            statements.append(f"ALTER TABLE {preparer.format_table(table)} ADD {column_ddl}")
+
+    for table in _ADDED_TABLES:
+        if inspector.has_table(table.name):
+            continue
+        statements.append(str(CreateTable(table).compile(dialect=engine.dialect)).strip())
+        for index in table.indexes:
+            statements.append(str(CreateIndex(index).compile(dialect=engine.dialect)))
+
+    return statements
+
+
+def upgrade_schema(engine: Engine, dry_run: bool = False) -> list[str]:
+    """
+    Aplica las sentencias de pending_schema_changes en una transacción
+    (o solo las devuelve si `dry_run`).
+    """
+    statements = pending_schema_changes(engine)
+    if statements and not dry_run:
+        with engine.begin() as conn:
+            for statement in statements:
+                conn.exec_driver_sql(statement)
+    return statements
@@ -1,16 +1,72 @@
-from fastapi import FastAPI
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 
 from db.base import Base
-from db.session import engine
+from db.instrumentation import SQLStatsMiddleware
+from db.session import engine, SessionLocal
 import models.user       # noqa: F401
 import models.airport    # noqa: F401
 import models.connection # noqa: F401
 import models.route      # noqa: F401
+import models.user_stats # noqa: F401
+
+from routers import auth, routes , airports,profile, imports, admin
+from services.graph_service import load_airport_index
+from services.graph_snapshot import get_graph_snapshot
+from services.job_queue import route_job_queue
+
+logger = logging.getLogger(__name__)
+
+
+def _warm_up(app: FastAPI) -> None:
+    """
+    Precarga el índice de aeropuertos (desde el snapshot si está
+    configurado) y mide el tiempo de arranque.
+    Si la BD no responde, el worker queda "no listo" y se reintenta
+    desde /health/ready.
+    """
+    started = time.perf_counter()
+    snapshot = get_graph_snapshot()
+    if snapshot is not None:
+        index = snapshot.airport_index()
+    else:
+        db = SessionLocal()
+        try:
+            index = load_airport_index(db)
+        except Exception:
+            logger.exception("No se pudo precargar el índice de aeropuertos")
+            return
+        finally:
+            db.close()
+
+    app.state.airports_loaded = len(index)
+    app.state.startup_seconds = time.perf_counter() - started
+    app.state.ready = True
+    logger.info(
+        "Worker listo: %d aeropuertos precargados en %.3fs",
+        len(index),
+        app.state.startup_seconds,
+    )
+
 
-from routers import auth, routes , airports,profile
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.ready = False
+    app.state.startup_seconds = None
+    app.state.airports_loaded = 0
+    await run_in_threadpool(_warm_up, app)
+    route_job_queue.start()
+    yield
+    await run_in_threadpool(route_job_queue.shutdown)
 
 
-app = FastAPI(title="Complejidad Routes API")
+app = FastAPI(title="Complejidad Routes API", lifespan=lifespan)
+app.add_middleware(SQLStatsMiddleware)
 
 
 @app.get("/")
@@ -18,8 +74,35 @@ async def root():
     return {"message": "API Complejidad funcionando"}
 
 
+@app.get("/health/live")
+async def health_live():
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """
+    Devuelve 200 solo cuando el worker terminó de precargar sus datos.
+    """
+    if not app.state.ready:
+        await run_in_threadpool(_warm_up, app)
+
+    if not app.state.ready:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "warming"},
+        )
+
+    return {
+        "status": "ready",
+        "startup_seconds": app.state.startup_seconds,
+        "airports_loaded": app.state.airports_loaded,
+    }
+
+
 app.include_router(auth.router)
 app.include_router(routes.router)
-app.include_router(airports.router)  
-app.include_router(profile.router)  
-
+app.include_router(airports.router)
+app.include_router(profile.router)
+app.include_router(imports.router)
+app.include_router(admin.router)
@@ -33,9 +33,16 @@ class RouteCalculated(Base):
     criteria = Column(String(20), nullable=False)
     total_stops = Column(Integer, nullable=False, default=0)
     algorithm = Column(String(30), nullable=False, default="dijkstra")
+    max_stops = Column(Integer, nullable=True)
+    avg_concurrency = Column(Float, nullable=True)
 
     user = relationship("User", back_populates="routes")
-    details = relationship("RouteDetail", back_populates="route", cascade="all, delete-orphan")
+    details = relationship(
+        "RouteDetail",
+        back_populates="route",
+        cascade="all, delete-orphan",
+        order_by="RouteDetail.route_order",
+    )
 
 
 class RouteDetail(Base):
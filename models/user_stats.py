@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, ForeignKey, Float, Numeric, DateTime, Index, func
+from db.base import Base
+
+
+class UserRouteStats(Base):
+    __tablename__ = "EstadisticasUsuario"
+
+    user_id = Column("user_id", Integer, ForeignKey("Usuarios.user_id"), primary_key=True)
+
+    route_count = Column(Integer, nullable=False, default=0)
+    total_distance = Column(Float, nullable=False, default=0.0)
+    total_cost = Column(Numeric(14, 2), nullable=False, default=0)
+    total_stops = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class UserAirportStats(Base):
+    __tablename__ = "EstadisticasUsuarioAeropuerto"
+
+    user_id = Column("user_id", Integer, ForeignKey("Usuarios.user_id"), primary_key=True)
+    airport_id = Column(
+        "airport_id",
+        Integer,
+        ForeignKey("Aeropuertos.airport_id"),
+        primary_key=True,
+    )
+    visits = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_EstadisticasUsuarioAeropuerto_user_visits", "user_id", "visits"),
+    )
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+
+from core.security import require_admin
+from db.instrumentation import pool_wait_stats
+from db.session import engine
+from services.profiling import get_profile_path, list_profiles
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(require_admin)],
+)
+
+
+@router.get("/profiles")
+def get_profiles():
+    """
+    Lista los perfiles guardados de peticiones lentas.
+    """
+    return list_profiles()
+
+
+@router.get("/profiles/{profile_id}")
+def download_profile(profile_id: str):
+    """
+    Descarga el perfil en formato pstats (abrir con snakeviz o pstats).
+    """
+    path = get_profile_path(profile_id)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Perfil no encontrado",
+        )
+    return FileResponse(
+        path,
+        media_type="application/octet-stream",
+        filename=f"{profile_id}.prof",
+    )
+
+
+@router.get("/db/pool")
+def get_pool_status():
+    """
+    Estado del pool de conexiones y tiempos de espera en checkout.
+    """
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checked_in": pool.checkedin(),
+        "wait": pool_wait_stats.snapshot(),
+    }
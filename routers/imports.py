@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from sqlalchemy.orm import Session
+
+from db.session import get_db
+from core.security import get_current_user, require_admin
+from schemas.imports import ImportResult
+from services.import_service import DEFAULT_CHUNK_SIZE, import_file
+
+router = APIRouter(
+    prefix="/import",
+    tags=["import"],
+    dependencies=[Depends(get_current_user), Depends(require_admin)],
+)
+
+
+def _run_import(db: Session, kind: str, file: UploadFile, chunk_size: int) -> ImportResult:
+    if chunk_size < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="chunk_size debe ser mayor que 0",
+        )
+    try:
+        return import_file(
+            db,
+            kind=kind,
+            source=file.file,
+            filename=file.filename or "",
+            chunk_size=chunk_size,
+        )
+    except (ValueError, KeyError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Archivo inválido: {e}",
+        )
+
+
+@router.post("/airports", response_model=ImportResult)
+def import_airports(
+    file: UploadFile = File(...),
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    db: Session = Depends(get_db),
+):
+    """
+    Importa aeropuertos desde CSV/XLSX (columnas de la tabla Aeropuertos).
+    """
+    return _run_import(db, "airports", file, chunk_size)
+
+
+@router.post("/connections", response_model=ImportResult)
+def import_connections(
+    file: UploadFile = File(...),
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    db: Session = Depends(get_db),
+):
+    """
+    Importa conexiones desde CSV/XLSX (columnas de la tabla Conexiones).
+    """
+    return _run_import(db, "connections", file, chunk_size)
@@ -1,15 +1,53 @@
 # routers/routes.py
 
+import asyncio
+import time
+
 import networkx as nx
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, selectinload
 
 from db.session import get_db
-from core.security import get_current_user
+from core.security import get_current_user, is_admin_token
 from models.user import User
+from models.airport import Airport
 from models.route import RouteCalculated, RouteDetail, RouteCriteriaEnum
-from schemas.route import RouteCalculateRequest, RouteHistoryItem
-from services.graph_service import build_graph_for_route, calculate_shortest_path  
+from schemas.route import (
+    ExportFormat,
+    ItineraryLeg,
+    ItineraryRequest,
+    ItineraryResponse,
+    ParetoRouteOption,
+    RoutePathAirport,
+    RouteCalculateRequest,
+    RouteDetailResponse,
+    RouteHistoryItem,
+    RouteJobRead,
+    RouteJobRequest,
+    RouteMatrixRequest,
+    RouteMatrixResponse,
+    RouteParetoRequest,
+    RouteParetoResponse,
+    UserRouteStatsRead,
+)
+from services.graph_service import (
+    build_graph_for_airports,
+    build_graph_for_route,
+    calculate_pareto_paths,
+    calculate_route_matrix,
+)
+from core.config import settings
+from services.itinerary_service import plan_itinerary
+from services.job_queue import QueueFullError, UserJobLimitError, route_job_queue
+from services.profiling import profile_call
+from services.user_stats_service import get_user_stats, record_route_removed
+from services.route_service import (
+    compute_route,
+    compute_route_shared,
+    save_route_for_user,
+)
+from services.export_service import iter_history_export
 
 router = APIRouter(
     prefix="/routes",
@@ -23,7 +61,145 @@ def calculate_route_endpoint(
     body: RouteCalculateRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
+    x_profile_token: str | None = Header(None),
 ):
+    """
+    Calcula la ruta y la guarda en el historial del usuario. Peticiones
+    idénticas concurrentes comparten el mismo cálculo, pero cada una
+    escribe su propia fila de historial.
+
+    Con X-Profile-Token (= ADMIN_TOKEN) se perfila la petición completa.
+    """
+    force_profile = is_admin_token(x_profile_token)
+    criteria = RouteCriteriaEnum(body.criteria.value)
+
+    def pipeline():
+        # Una petición perfilada calcula por sí misma en lugar de esperar
+        # a otra en curso, para que el perfil refleje el cálculo real.
+        compute = compute_route if force_profile else compute_route_shared
+        result = compute(
+            db,
+            origin_id=body.origin_id,
+            destiny_id=body.destiny_id,
+            criteria=criteria,
+            max_stops=body.max_stops,
+            max_concurrency=body.max_concurrency,
+            graph_mode=body.graph_mode.value,
+        )
+        route = save_route_for_user(
+            db,
+            current_user,
+            origin_id=body.origin_id,
+            destiny_id=body.destiny_id,
+            criteria=criteria,
+            result=result,
+            max_stops=body.max_stops,
+        )
+        return result, route
+
+    try:
+        _, route = profile_call(
+            "routes.calculate",
+            params=body.model_dump(mode="json"),
+            fn=pipeline,
+            force=force_profile,
+        )
+        return route
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    except nx.NetworkXNoPath as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
+        )
+    except nx.NodeNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Alguno de los aeropuertos indicados no existe en el grafo.",
+        )
+
+
+@router.post("/jobs", response_model=RouteJobRead, status_code=status.HTTP_202_ACCEPTED)
+def submit_route_job(
+    body: RouteJobRequest,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Encola el cálculo de una ruta y devuelve el id del job al instante.
+    """
+    params = body.model_dump(mode="json", exclude={"priority"})
+    try:
+        job = route_job_queue.submit(current_user.id, params, body.priority.value)
+    except UserJobLimitError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+        )
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+        )
+    return RouteJobRead.model_validate(job)
+
+
+@router.get("/jobs/{job_id}", response_model=RouteJobRead)
+async def get_route_job(
+    job_id: str,
+    wait: float = 0,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Estado del job. Con `wait` (segundos) espera hasta que termine
+    (long-poll), con un máximo de ROUTE_JOB_MAX_WAIT_S.
+    """
+    # get_current_user ya usó la sesión; se libera la conexión para no
+    # retener una del pool durante la espera.
+    user_id = current_user.id
+    db.close()
+
+    job = route_job_queue.get(job_id, user_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job no encontrado",
+        )
+
+    deadline = time.monotonic() + min(max(wait, 0), settings.ROUTE_JOB_MAX_WAIT_S)
+    while not job.is_finished and time.monotonic() < deadline:
+        await asyncio.sleep(0.2)
+        job = route_job_queue.get(job_id, user_id) or job
+
+    return RouteJobRead.model_validate(job)
+
+
+@router.delete("/jobs/{job_id}", response_model=RouteJobRead)
+def cancel_route_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    job = route_job_queue.cancel(job_id, current_user.id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job no encontrado",
+        )
+    return RouteJobRead.model_validate(job)
+
+
+@router.post("/pareto", response_model=RouteParetoResponse)
+def calculate_pareto_endpoint(
+    body: RouteParetoRequest,
+    db: Session = Depends(get_db),
+):
+    """
+    Devuelve el frente de Pareto de rutas (distancia vs. costo y,
+    opcionalmente, escalas) entre origen y destino.
+    """
     try:
         G = build_graph_for_route(
             db,
@@ -38,13 +214,14 @@ def calculate_route_endpoint(
         )
 
     try:
-        path_nodes, total_distance, total_cost = calculate_shortest_path(
+        results = calculate_pareto_paths(
             G,
             origin_id=body.origin_id,
             destiny_id=body.destiny_id,
-            criteria=body.criteria.value,
+            include_stops=body.include_stops,
             max_stops=body.max_stops,
             max_concurrency=body.max_concurrency,
+            max_labels_per_node=body.max_labels_per_node,
         )
     except nx.NetworkXNoPath as e:
         raise HTTPException(
@@ -57,52 +234,123 @@ def calculate_route_endpoint(
             detail="Alguno de los aeropuertos indicados no existe en el grafo.",
         )
 
-    total_stops = max(len(path_nodes) - 2, 0)
+    return RouteParetoResponse(
+        origin_id=body.origin_id,
+        destiny_id=body.destiny_id,
+        options=[
+            ParetoRouteOption(
+                path=path,
+                total_distance=total_distance,
+                total_cost=total_cost,
+                total_stops=max(len(path) - 2, 0),
+            )
+            for path, total_distance, total_cost in results
+        ],
+    )
 
-    avg_concurrency = None
-    if path_nodes:
-        sum_conc = 0
-        for node_id in path_nodes:
-            node_data = G.nodes[node_id]
-            conc = int(node_data.get("concurrency", 0) or 0)
-            sum_conc += conc
-        avg_concurrency = sum_conc / len(path_nodes)
 
-    if body.criteria == RouteCriteriaEnum.DISTANCE:
-        algorithm = "dijkstra"
-    elif body.criteria == RouteCriteriaEnum.COST:
-        algorithm = "bellman_ford"
-    else:
-        algorithm = "dijkstra"
+@router.post("/matrix", response_model=RouteMatrixResponse)
+def calculate_matrix_endpoint(
+    body: RouteMatrixRequest,
+    db: Session = Depends(get_db),
+):
+    """
+    Matrices origen x destino de distancia, costo y escalas sobre un único
+    subgrafo compartido. No guarda historial.
+    """
+    try:
+        G = build_graph_for_airports(
+            db,
+            airport_ids=set(body.origin_ids) | set(body.destiny_ids),
+            max_nodes=body.max_nodes,
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
 
-    route = RouteCalculated(
-        user_id=current_user.id,
-        origin_id=body.origin_id,
-        destiny_id=body.destiny_id,
-        total_distance=total_distance,
-        total_cost=total_cost,
+    distances, costs, paths = calculate_route_matrix(
+        G,
+        origin_ids=body.origin_ids,
+        destiny_ids=body.destiny_ids,
         criteria=body.criteria.value,
-        total_stops=total_stops,
-        algorithm=algorithm,
+        max_concurrency=body.max_concurrency,
     )
-    db.add(route)
-    db.flush()
 
-    for order, airport_id in enumerate(path_nodes):
-        detail = RouteDetail(
-            route_id=route.id,
-            route_order=order,
-            airport_id=airport_id,
+    return RouteMatrixResponse(
+        origin_ids=body.origin_ids,
+        destiny_ids=body.destiny_ids,
+        criteria=body.criteria.value,
+        distance=distances,
+        cost=costs,
+        stops=[
+            [max(len(p) - 2, 0) if p is not None else None for p in row]
+            for row in paths
+        ],
+    )
+
+
+@router.post("/itinerary", response_model=ItineraryResponse)
+def calculate_itinerary_endpoint(
+    body: ItineraryRequest,
+    db: Session = Depends(get_db),
+):
+    """
+    Orden óptimo (o aproximado, para muchos aeropuertos) para visitar
+    todos los aeropuertos indicados, empezando por el primero.
+    """
+    try:
+        plan = plan_itinerary(
+            db,
+            airport_ids=body.airport_ids,
+            criteria=body.criteria.value,
+            return_to_start=body.return_to_start,
+            max_concurrency=body.max_concurrency,
+            max_nodes=body.max_nodes,
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    except nx.NetworkXNoPath as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e),
         )
-        db.add(detail)
 
-    db.commit()
-    db.refresh(route)
+    return ItineraryResponse(
+        order=plan.order,
+        method=plan.method,
+        criteria=body.criteria.value,
+        total_distance=plan.total_distance,
+        total_cost=plan.total_cost,
+        total_stops=max(len(plan.path) - 2, 0),
+        path=plan.path,
+        legs=[
+            ItineraryLeg(
+                origin_id=origin_id,
+                destiny_id=destiny_id,
+                total_distance=distance,
+                total_cost=cost,
+                path=path,
+            )
+            for origin_id, destiny_id, distance, cost, path in plan.legs
+        ],
+    )
 
-    route.max_stops = body.max_stops
-    route.avg_concurrency = avg_concurrency
 
-    return route
+@router.get("/stats", response_model=UserRouteStatsRead)
+def get_route_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Totales del usuario (rutas, distancia, costo, escalas y aeropuertos
+    más frecuentes), mantenidos de forma incremental.
+    """
+    return get_user_stats(db, current_user.id)
 
 
 @router.get("/history", response_model=list[RouteHistoryItem])
@@ -123,6 +371,82 @@ def get_history(
     return routes
 
 
+@router.get("/history/export")
+def export_history(
+    format: ExportFormat = ExportFormat.ndjson,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Exporta el historial del usuario con el camino completo de cada ruta,
+    en streaming (CSV o NDJSON).
+    """
+    if format == ExportFormat.csv:
+        media_type = "text/csv"
+    else:
+        media_type = "application/x-ndjson"
+
+    return StreamingResponse(
+        iter_history_export(current_user.id, format.value),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="route_history.{format.value}"',
+        },
+    )
+
+
+@router.get("/history/{route_id}", response_model=RouteDetailResponse)
+def get_history_item(
+    route_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Devuelve una ruta del historial con su camino completo.
+    Usa tres consultas fijas: ruta, detalle (selectinload) y aeropuertos.
+    """
+    route = (
+        db.query(RouteCalculated)
+        .options(selectinload(RouteCalculated.details))
+        .filter(
+            RouteCalculated.id == route_id,
+            RouteCalculated.user_id == current_user.id,
+        )
+        .first()
+    )
+    if not route:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ruta no encontrada en el historial del usuario",
+        )
+
+    airport_ids = {d.airport_id for d in route.details}
+    airports_by_id = {}
+    if airport_ids:
+        airports_by_id = {
+            a.id: a
+            for a in db.query(Airport).filter(Airport.id.in_(airport_ids)).all()
+        }
+
+    path = []
+    for d in route.details:
+        airport = airports_by_id.get(d.airport_id)
+        if airport is None:
+            continue
+        path.append(
+            RoutePathAirport(
+                route_order=d.route_order,
+                airport_id=airport.id,
+                name=airport.name,
+                city=airport.city,
+                country=airport.country,
+                lat=airport.lat,
+                lon=airport.lon,
+            )
+        )
+
+    response = RouteDetailResponse.model_validate(route)
+    response.path = path
+    return response
 
 
 @router.delete("/history/{route_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -145,6 +469,7 @@ def delete_history_item(
             detail="Ruta no encontrada en el historial del usuario",
         )
 
+    record_route_removed(db, route)
     db.query(RouteDetail).filter(RouteDetail.route_id == route.id).delete()
     db.delete(route)
     db.commit()
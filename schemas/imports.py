@@ -0,0 +1,32 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class AirportImportRow(BaseModel):
+    airport_id: int
+    airport_name: str = Field(max_length=150)
+    city: Optional[str] = Field(None, max_length=100)
+    country: Optional[str] = Field(None, max_length=100)
+    lat: float = Field(ge=-90, le=90)
+    lon: float = Field(ge=-180, le=180)
+    concurrency: int = Field(3, ge=0)
+
+
+class ConnectionImportRow(BaseModel):
+    conection_id: int
+    airport_a: int
+    airport_b: int
+    distance: float = Field(ge=0)
+    congestion_factor: float = Field(1.0, gt=0)
+    cost: float = Field(ge=0)
+
+
+class ImportResult(BaseModel):
+    kind: str
+    rows_read: int
+    rows_imported: int
+    rows_rejected: int
+    errors: list[str] = []
+    elapsed_seconds: float
+    rows_per_second: float
@@ -1,18 +1,101 @@
 
 from enum import Enum
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 
+# Tope de nodos para endpoints síncronos: la densificación del subconjunto
+# es O(n^2 log n) y escribe conexiones en la BD.
+MAX_SYNC_GRAPH_NODES = 600
+# Los jobs admiten más, pero acotado a lo que cabe en ROUTE_JOB_TIMEOUT_S:
+# la densificación no se puede interrumpir a mitad.
+MAX_JOB_GRAPH_NODES = 2000
+
 class Criteria(str, Enum):
     distance = "distance"
     cost = "cost"
 
+class GraphMode(str, Enum):
+    nearest = "nearest"
+    corridor = "corridor"
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+
 class RouteCalculateRequest(BaseModel):
     origin_id: int
     destiny_id: int
     criteria: Criteria
     max_stops: int | None = None         
     max_concurrency: int | None = None   
+    graph_mode: GraphMode = GraphMode.nearest
+
+class JobPriority(str, Enum):
+    high = "high"
+    normal = "normal"
+    low = "low"
+
+class RouteJobRequest(RouteCalculateRequest):
+    priority: JobPriority = JobPriority.normal
+    max_nodes: int = Field(300, ge=2, le=MAX_JOB_GRAPH_NODES)
+
+class RouteParetoRequest(BaseModel):
+    origin_id: int
+    destiny_id: int
+    include_stops: bool = False
+    max_stops: int | None = None
+    max_concurrency: int | None = None
+    max_labels_per_node: int = Field(30, ge=1, le=200)
+
+class ParetoRouteOption(BaseModel):
+    path: list[int]
+    total_distance: float
+    total_cost: float
+    total_stops: int
+
+class RouteParetoResponse(BaseModel):
+    origin_id: int
+    destiny_id: int
+    options: list[ParetoRouteOption]
+
+class RouteMatrixRequest(BaseModel):
+    origin_ids: list[int] = Field(min_length=1, max_length=100)
+    destiny_ids: list[int] = Field(min_length=1, max_length=100)
+    criteria: Criteria = Criteria.distance
+    max_concurrency: int | None = None
+    max_nodes: int = Field(MAX_SYNC_GRAPH_NODES, ge=2, le=MAX_SYNC_GRAPH_NODES)
+
+class RouteMatrixResponse(BaseModel):
+    origin_ids: list[int]
+    destiny_ids: list[int]
+    criteria: str
+    distance: list[list[float | None]]
+    cost: list[list[float | None]]
+    stops: list[list[int | None]]
+
+class ItineraryRequest(BaseModel):
+    airport_ids: list[int] = Field(min_length=2, max_length=100)
+    criteria: Criteria = Criteria.distance
+    return_to_start: bool = False
+    max_concurrency: int | None = None
+    max_nodes: int = Field(MAX_SYNC_GRAPH_NODES, ge=2, le=MAX_SYNC_GRAPH_NODES)
+
+class ItineraryLeg(BaseModel):
+    origin_id: int
+    destiny_id: int
+    total_distance: float
+    total_cost: float
+    path: list[int]
+
+class ItineraryResponse(BaseModel):
+    order: list[int]
+    method: str
+    criteria: str
+    total_distance: float
+    total_cost: float
+    total_stops: int
+    path: list[int]
+    legs: list[ItineraryLeg]
 
 class RouteHistoryItem(BaseModel):
     id: int
@@ -29,3 +112,41 @@ class RouteHistoryItem(BaseModel):
 
     class Config:
         from_attributes = True
+
+class RoutePathAirport(BaseModel):
+    route_order: int
+    airport_id: int
+    name: str
+    city: str | None = None
+    country: str | None = None
+    lat: float
+    lon: float
+
+class RouteDetailResponse(RouteHistoryItem):
+    path: list[RoutePathAirport] = []
+
+class RouteJobRead(BaseModel):
+    id: str
+    status: str
+    priority: str
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    error: str | None = None
+    error_status: int | None = None
+    result: RouteHistoryItem | None = None
+
+    class Config:
+        from_attributes = True
+
+class AirportVisits(BaseModel):
+    airport_id: int
+    name: str
+    visits: int
+
+class UserRouteStatsRead(BaseModel):
+    route_count: int
+    total_distance: float
+    total_cost: float
+    avg_stops: float
+    top_airports: list[AirportVisits] = []
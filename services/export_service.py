@@ -0,0 +1,126 @@
+import csv
+import io
+import json
+from itertools import groupby
+from typing import Iterator
+
+from sqlalchemy import select
+
+from db.session import SessionLocal
+from models.airport import Airport
+from models.route import RouteCalculated, RouteDetail
+
+# Filas que trae cada fetch del cursor del servidor.
+EXPORT_YIELD_PER = 2000
+# Rutas que se agrupan en cada bloque enviado al cliente.
+EXPORT_FLUSH_EVERY = 500
+
+EXPORT_COLUMNS = [
+    "route_id",
+    "user_id",
+    "origin_id",
+    "destiny_id",
+    "total_distance",
+    "total_cost",
+    "criteria",
+    "total_stops",
+    "algorithm",
+    "query_date",
+    "path",
+    "path_names",
+]
+
+
+def _history_rows_stmt(user_id: int):
+    """
+    Una sola consulta: rutas + detalle + aeropuerto, ordenadas por ruta y
+    por orden dentro de la ruta, para agrupar el camino sin N+1.
+    """
+    return (
+        select(
+            RouteCalculated.id,
+            RouteCalculated.user_id,
+            RouteCalculated.origin_id,
+            RouteCalculated.destiny_id,
+            RouteCalculated.total_distance,
+            RouteCalculated.total_cost,
+            RouteCalculated.criteria,
+            RouteCalculated.total_stops,
+            RouteCalculated.algorithm,
+            RouteCalculated.query_date,
+            RouteDetail.airport_id,
+            Airport.name.label("airport_name"),
+        )
+        .outerjoin(RouteDetail, RouteDetail.route_id == RouteCalculated.id)
+        .outerjoin(Airport, Airport.id == RouteDetail.airport_id)
+        .where(RouteCalculated.user_id == user_id)
+        .order_by(RouteCalculated.id, RouteDetail.route_order)
+        .execution_options(yield_per=EXPORT_YIELD_PER)
+    )
+
+
+def _iter_route_records(db, user_id: int) -> Iterator[dict]:
+    result = db.execute(_history_rows_stmt(user_id))
+    for _, rows in groupby(result, key=lambda r: r.id):
+        rows = list(rows)
+        head = rows[0]
+        yield {
+            "route_id": head.id,
+            "user_id": head.user_id,
+            "origin_id": head.origin_id,
+            "destiny_id": head.destiny_id,
+            "total_distance": float(head.total_distance),
+            "total_cost": float(head.total_cost),
+            "criteria": head.criteria,
+            "total_stops": head.total_stops,
+            "algorithm": head.algorithm,
+            "query_date": head.query_date.isoformat() if head.query_date else None,
+            "path": [r.airport_id for r in rows if r.airport_id is not None],
+            "path_names": [r.airport_name for r in rows if r.airport_id is not None],
+        }
+
+
+def _format_ndjson(records: list[dict]) -> str:
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+
+
+def _format_csv(records: list[dict], with_header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if with_header:
+        writer.writerow(EXPORT_COLUMNS)
+    for r in records:
+        row = dict(r)
+        row["path"] = "|".join(str(a) for a in r["path"])
+        row["path_names"] = "|".join(n or "" for n in r["path_names"])
+        writer.writerow([row[c] for c in EXPORT_COLUMNS])
+    return buffer.getvalue()
+
+
+def iter_history_export(user_id: int, fmt: str) -> Iterator[str]:
+    """
+    Genera el historial del usuario en CSV o NDJSON por bloques.
+    Abre su propia sesión porque el generador se consume después de que
+    FastAPI cierre la sesión de la dependencia get_db.
+    """
+    db = SessionLocal()
+    try:
+        pending: list[dict] = []
+        header_sent = False
+        for record in _iter_route_records(db, user_id):
+            pending.append(record)
+            if len(pending) >= EXPORT_FLUSH_EVERY:
+                if fmt == "csv":
+                    yield _format_csv(pending, with_header=not header_sent)
+                    header_sent = True
+                else:
+                    yield _format_ndjson(pending)
+                pending = []
+
+        if fmt == "csv":
+            if pending or not header_sent:
+                yield _format_csv(pending, with_header=not header_sent)
+        elif pending:
+            yield _format_ndjson(pending)
+    finally:
+        db.close()
@@ -1,14 +1,31 @@
 
+import heapq
 import math
 import random
+import threading
+import time
 import networkx as nx
 from sqlalchemy.orm import Session
 from typing import Optional
 from models.airport import Airport
 from models.connection import Connection
+from services.graph_snapshot import get_graph_snapshot
 
 COST_PER_KM = 5.0
 
+# Índice en memoria {airport_id: (lat, lon)} compartido por el worker.
+# Se precarga en el arranque (ver main.lifespan) para que la primera ruta
+# no pague el escaneo completo de la tabla Aeropuertos.
+_airport_index: Optional[dict[int, tuple[float, float]]] = None
+_airport_index_lock = threading.Lock()
+
+# Índice espacial por celdas de lat/lon para el modo corredor. Se reconstruye
+# cuando cambia el objeto índice (recarga o snapshot nuevo).
+CORRIDOR_CELL_DEG = 2.0
+CORRIDOR_MIN_BUFFER_KM = 300.0
+KM_PER_DEG_LAT = 111.195
+_corridor_grid: Optional[tuple[dict, dict[tuple[int, int], list[int]]]] = None
+
 
 def haversine(lat1, lon1, lat2, lon2) -> float:
     """Distancia aproximada en km entre dos puntos (lat, lon)."""
@@ -49,57 +66,35 @@ def _congestion_factor_for_edge(deg_a: int, deg_b: int) -> float:
         return 1.6
 
 
-def _ensure_connections_for_subset(
-    db: Session,
+def _plan_connections_for_subset(
+    coords: list[tuple[int, float, float]],
+    existing_edges: list[tuple[int, int]],
     subset_ids: set[int],
-) -> None:
-  
-
-    if len(subset_ids) < 2:
-        return
-
-    airports = (
-        db.query(Airport)
-        .filter(Airport.id.in_(subset_ids))
-        .all()
-    )
-    airport_by_id = {a.id: a for a in airports}
-
-    existing_conns = (
-        db.query(Connection)
-        .filter(
-            Connection.airport_a_id.in_(subset_ids),
-            Connection.airport_b_id.in_(subset_ids),
-        )
-        .all()
-    )
-
+) -> tuple[list[tuple[int, int, float, float, float]], dict[int, int]]:
+    """
+    Decide qué conexiones faltan en el subconjunto, sin tocar la BD.
+    Devuelve (nuevas aristas (a, b, distance, congestion_factor, cost),
+    concurrencia resultante por aeropuerto).
+    """
     current_degree: dict[int, int] = {aid: 0 for aid in subset_ids}
     edge_set: set[frozenset[int]] = set()
 
-    for c in existing_conns:
-        a = c.airport_a_id
-        b = c.airport_b_id
+    for a, b in existing_edges:
         if a in subset_ids:
             current_degree[a] += 1
         if b in subset_ids:
             current_degree[b] += 1
         edge_set.add(frozenset({a, b}))
 
-    
+    # Semilla por aeropuerto: el mismo subconjunto se densifica siempre
+    # igual (en modo snapshot no se persiste nada entre peticiones).
     target_degree: dict[int, int] = {}
     for aid in subset_ids:
-        rnd = random.choice([3, 5, 7])
+        rnd = random.Random(aid).choice([3, 5, 7])
         target = max(current_degree[aid], rnd)
         target = min(target, 7)  # límite superior
         target_degree[aid] = target
 
-    
-    coords = [
-        (a.id, a.lat, a.lon)
-        for a in airports
-    ]
-
     new_edges: list[tuple[int, int, float]] = []
 
     for id1, lat1, lon1 in coords:
@@ -129,18 +124,56 @@ def _ensure_connections_for_subset(
             current_degree[id1] += 1
             current_degree[id2] += 1
 
-    for aid, deg in current_degree.items():
-        airport = airport_by_id.get(aid)
-        if not airport:
-            continue
-        airport.concurrency = _classify_concurrency(deg)
-
+    planned = []
     for id1, id2, dist in new_edges:
         deg_a = current_degree[id1]
         deg_b = current_degree[id2]
         congestion_factor = _congestion_factor_for_edge(deg_a, deg_b)
         cost = dist * COST_PER_KM * congestion_factor
+        planned.append((id1, id2, dist, congestion_factor, cost))
+
+    concurrency = {aid: _classify_concurrency(deg) for aid, deg in current_degree.items()}
+    return planned, concurrency
+
+
+def _ensure_connections_for_subset(
+    db: Session,
+    subset_ids: set[int],
+) -> None:
+  
+
+    if len(subset_ids) < 2:
+        return
+
+    airports = (
+        db.query(Airport)
+        .filter(Airport.id.in_(subset_ids))
+        .all()
+    )
+    airport_by_id = {a.id: a for a in airports}
+
+    existing_conns = (
+        db.query(Connection)
+        .filter(
+            Connection.airport_a_id.in_(subset_ids),
+            Connection.airport_b_id.in_(subset_ids),
+        )
+        .all()
+    )
+
+    new_edges, concurrency = _plan_connections_for_subset(
+        sorted((a.id, a.lat, a.lon) for a in airports),
+        [(c.airport_a_id, c.airport_b_id) for c in existing_conns],
+        subset_ids,
+    )
+
+    for aid, conc in concurrency.items():
+        airport = airport_by_id.get(aid)
+        if not airport:
+            continue
+        airport.concurrency = conc
 
+    for id1, id2, dist, congestion_factor, cost in new_edges:
         conn = Connection(
             airport_a_id=id1,
             airport_b_id=id2,
@@ -153,34 +186,102 @@ def _ensure_connections_for_subset(
     db.commit()
 
 
-def build_graph_for_route(
-    db: Session,
-    origin_id: int,
-    destiny_id: int,
-    max_nodes: int = 300,
-) -> nx.Graph:
-  
+def _densify_graph_in_memory(G: nx.Graph) -> None:
+    """
+    Misma densificación que _ensure_connections_for_subset, aplicada solo
+    al subgrafo (sin escribir en la BD). Se usa con el snapshot, que es de
+    solo lectura.
+    """
+    if G.number_of_nodes() < 2:
+        return
 
-    airports = db.query(Airport).all()
-    if len(airports) < 2:
-        raise ValueError("No hay suficientes aeropuertos en la base de datos.")
+    new_edges, concurrency = _plan_connections_for_subset(
+        sorted((n, data["lat"], data["lon"]) for n, data in G.nodes(data=True)),
+        list(G.edges()),
+        set(G.nodes),
+    )
+    for aid, conc in concurrency.items():
+        G.nodes[aid]["concurrency"] = conc
+    for id1, id2, dist, congestion_factor, cost in new_edges:
+        G.add_edge(
+            id1,
+            id2,
+            distance=float(dist),
+            cost=float(cost),
+            congestion_factor=float(congestion_factor),
+        )
 
-    airport_by_id = {a.id: a for a in airports}
-    origin = airport_by_id.get(origin_id)
-    destiny = airport_by_id.get(destiny_id)
 
-    if origin is None or destiny is None:
-        raise ValueError("Origen o destino no existen en la tabla Aeropuertos.")
+def load_airport_index(db: Session) -> dict[int, tuple[float, float]]:
+    """
+    Carga (o recarga) el índice de coordenadas de aeropuertos desde la BD.
+    """
+    global _airport_index
+
+    rows = db.query(Airport.id, Airport.lat, Airport.lon).all()
+    index = {aid: (float(lat), float(lon)) for aid, lat, lon in rows}
+    with _airport_index_lock:
+        _airport_index = index
+    return index
+
+
+def get_airport_index(db: Session) -> dict[int, tuple[float, float]]:
+    """
+    Devuelve el índice de aeropuertos, cargándolo si aún no existe.
+    """
+    index = _airport_index
+    if index is None:
+        index = load_airport_index(db)
+    return index
+
+
+def invalidate_airport_index() -> None:
+    """
+    Descarta el índice en memoria; se recargará en la próxima consulta.
+    """
+    global _airport_index
+
+    with _airport_index_lock:
+        _airport_index = None
 
-    distances = []
-    for a in airports:
-        d = haversine(origin.lat, origin.lon, a.lat, a.lon)
-        distances.append((a.id, d))
 
-    distances.sort(key=lambda x: x[1])
+def _index_for_airports(db: Session, airport_ids: set[int]):
+    """
+    Devuelve (índice, snapshot) asegurando que el índice esté al día
+    respecto de `airport_ids`.
+    """
+    snapshot = get_graph_snapshot()
+    if snapshot is not None:
+        index = snapshot.airport_index()
+    else:
+        index = get_airport_index(db)
+        if not airport_ids.issubset(index.keys()):
+            # El índice puede estar desactualizado (aeropuertos nuevos).
+            index = load_airport_index(db)
+    return index, snapshot
+
+
+def _nearest_airport_ids(
+    index: dict[int, tuple[float, float]],
+    airport_id: int,
+    k: int,
+) -> set[int]:
+    lat, lon = index[airport_id]
+    nearest = heapq.nsmallest(
+        k,
+        index.items(),
+        key=lambda item: haversine(lat, lon, item[1][0], item[1][1]),
+    )
+    return {aid for aid, _ in nearest}
+
 
-    subset_ids: set[int] = {aid for aid, _ in distances[:max_nodes]}
-    subset_ids.add(destiny_id)  # asegurar destino
+def _build_graph_for_subset(db: Session, subset_ids: set[int], snapshot) -> nx.Graph:
+    if snapshot is not None:
+        # El snapshot es de solo lectura: se densifica el subgrafo en memoria,
+        # igual que hace la ruta por BD, pero sin persistir las conexiones.
+        G = snapshot.subgraph(subset_ids)
+        _densify_graph_in_memory(G)
+        return G
 
     _ensure_connections_for_subset(db, subset_ids)
 
@@ -222,6 +323,152 @@ def build_graph_for_route(
     return G
 
 
+def _grid_cell(lat: float, lon: float) -> tuple[int, int]:
+    return (
+        int((lat + 90.0) // CORRIDOR_CELL_DEG),
+        int((lon + 180.0) // CORRIDOR_CELL_DEG),
+    )
+
+
+def _get_corridor_grid(
+    index: dict[int, tuple[float, float]],
+) -> dict[tuple[int, int], list[int]]:
+    global _corridor_grid
+
+    cached = _corridor_grid
+    if cached is not None and cached[0] is index:
+        return cached[1]
+
+    grid: dict[tuple[int, int], list[int]] = {}
+    for aid, (lat, lon) in index.items():
+        grid.setdefault(_grid_cell(lat, lon), []).append(aid)
+    _corridor_grid = (index, grid)
+    return grid
+
+
+def _great_circle_midpoint(lat1, lon1, lat2, lon2) -> tuple[float, float]:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    l1 = math.radians(lon1)
+    dl = math.radians(lon2 - lon1)
+    bx = math.cos(p2) * math.cos(dl)
+    by = math.cos(p2) * math.sin(dl)
+    lat = math.atan2(math.sin(p1) + math.sin(p2), math.sqrt((math.cos(p1) + bx) ** 2 + by ** 2))
+    lon = l1 + math.atan2(by, math.cos(p1) + bx)
+    return math.degrees(lat), (math.degrees(lon) + 540.0) % 360.0 - 180.0
+
+
+def _corridor_airport_ids(
+    index: dict[int, tuple[float, float]],
+    origin_id: int,
+    destiny_id: int,
+    detour: float,
+    max_nodes: int,
+) -> set[int]:
+    """
+    Aeropuertos dentro de la elipse con focos en origen y destino:
+    d(o, x) + d(x, d) <= d(o, d) * (1 + detour) + CORRIDOR_MIN_BUFFER_KM.
+    Si hay más de `max_nodes`, se quedan los de menor desvío.
+    """
+    o_lat, o_lon = index[origin_id]
+    d_lat, d_lon = index[destiny_id]
+    direct = haversine(o_lat, o_lon, d_lat, d_lon)
+    limit = direct * (1.0 + detour) + CORRIDOR_MIN_BUFFER_KM
+
+    # Todo punto de la elipse está a <= (direct + limit) / 2 del punto medio.
+    m_lat, m_lon = _great_circle_midpoint(o_lat, o_lon, d_lat, d_lon)
+    radius_deg = (direct + limit) / 2 / KM_PER_DEG_LAT
+
+    grid = _get_corridor_grid(index)
+    lat_min = max(m_lat - radius_deg, -90.0)
+    lat_max = min(m_lat + radius_deg, 90.0)
+    max_abs_lat = max(abs(lat_min), abs(lat_max))
+    n_lon_cells = int(360.0 // CORRIDOR_CELL_DEG)
+
+    if max_abs_lat >= 89.0:
+        lon_cells = range(n_lon_cells)
+    else:
+        lon_span = radius_deg / math.cos(math.radians(max_abs_lat))
+        if lon_span >= 180.0:
+            lon_cells = range(n_lon_cells)
+        else:
+            first = _grid_cell(0.0, m_lon - lon_span)[1]
+            last = _grid_cell(0.0, m_lon + lon_span)[1]
+            lon_cells = [c % n_lon_cells for c in range(first, last + 1)]
+
+    lat_first = _grid_cell(lat_min, 0.0)[0]
+    lat_last = _grid_cell(lat_max, 0.0)[0]
+
+    candidates: list[tuple[float, int]] = []
+    for lat_cell in range(lat_first, lat_last + 1):
+        for lon_cell in lon_cells:
+            for aid in grid.get((lat_cell, lon_cell), ()):
+                lat, lon = index[aid]
+                detour_km = haversine(o_lat, o_lon, lat, lon) + haversine(lat, lon, d_lat, d_lon)
+                if detour_km <= limit:
+                    candidates.append((detour_km, aid))
+
+    subset_ids = {aid for _, aid in heapq.nsmallest(max_nodes, candidates)}
+    subset_ids.update((origin_id, destiny_id))
+    return subset_ids
+
+
+def build_graph_for_route(
+    db: Session,
+    origin_id: int,
+    destiny_id: int,
+    max_nodes: int = 300,
+    mode: str = "nearest",
+    detour: float = 0.25,
+) -> nx.Graph:
+    """
+    Subgrafo para buscar la ruta origen -> destino.
+      - nearest : los `max_nodes` aeropuertos más cercanos al origen + destino.
+      - corridor: aeropuertos dentro de la elipse origen/destino con un
+                  desvío relativo `detour` (ver _corridor_airport_ids).
+    """
+
+    index, snapshot = _index_for_airports(db, {origin_id, destiny_id})
+
+    if len(index) < 2:
+        raise ValueError("No hay suficientes aeropuertos en la base de datos.")
+
+    if origin_id not in index or destiny_id not in index:
+        raise ValueError("Origen o destino no existen en la tabla Aeropuertos.")
+
+    if mode == "corridor":
+        subset_ids = _corridor_airport_ids(index, origin_id, destiny_id, detour, max_nodes)
+    else:
+        subset_ids = _nearest_airport_ids(index, origin_id, max_nodes)
+        subset_ids.add(destiny_id)  # asegurar destino
+
+    return _build_graph_for_subset(db, subset_ids, snapshot)
+
+
+def build_graph_for_airports(
+    db: Session,
+    airport_ids: set[int],
+    max_nodes: int = 600,
+) -> nx.Graph:
+    """
+    Un único subgrafo que cubre varios aeropuertos: reparte `max_nodes`
+    entre los vecindarios más cercanos de cada uno.
+    """
+    index, snapshot = _index_for_airports(db, airport_ids)
+
+    missing = airport_ids - index.keys()
+    if missing:
+        raise ValueError(
+            f"Aeropuertos inexistentes en la tabla Aeropuertos: {sorted(missing)}"
+        )
+
+    per_airport = max(max_nodes // max(len(airport_ids), 1), 2)
+    subset_ids: set[int] = set(airport_ids)
+    for aid in airport_ids:
+        subset_ids |= _nearest_airport_ids(index, aid, per_airport)
+
+    return _build_graph_for_subset(db, subset_ids, snapshot)
+
+
 import networkx as nx
 from typing import Optional
 
@@ -233,12 +480,15 @@ def calculate_shortest_path(
     max_stops: Optional[int] = None,
     max_concurrency: Optional[int] = None,
     max_candidates: int = 200,   
+    deadline: Optional[float] = None,
 ):
     """
     Calcula la mejor ruta según el criterio (distance/cost),
     aplicando restricciones opcionales:
       - max_stops: número máximo de paradas (nodos intermedios)
       - max_concurrency: concurrencia máxima permitida en los aeropuertos
+    Con `deadline` (time.monotonic()) la búsqueda de candidatos lanza
+    TimeoutError al superarlo.
     """
 
     if max_stops is None and max_concurrency is None:
@@ -290,6 +540,8 @@ def calculate_shortest_path(
     for idx, path in enumerate(paths_generator):
         if idx >= max_candidates:
             break
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError("Tiempo máximo de búsqueda superado")
 
         stops = max(len(path) - 2, 0)
         if max_stops is not None and stops > max_stops:
@@ -320,3 +572,183 @@ def calculate_shortest_path(
         f"(max_candidates={max_candidates}, max_stops={max_stops}, max_concurrency={max_concurrency})."
     )
 
+
+
+def _dominates(a: tuple, b: tuple) -> bool:
+    """True si `a` es <= que `b` en todos los criterios (incluye empate)."""
+    return all(x <= y for x, y in zip(a, b))
+
+
+def calculate_pareto_paths(
+    G: nx.Graph,
+    origin_id: int,
+    destiny_id: int,
+    include_stops: bool = False,
+    max_stops: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    max_labels_per_node: int = 30,
+) -> list[tuple[list[int], float, float]]:
+    """
+    Búsqueda multiobjetivo (label-setting) sobre (distance, cost) y,
+    opcionalmente, número de escalas. Devuelve el conjunto de rutas no
+    dominadas ordenado por distancia.
+
+    Cada nodo guarda como máximo `max_labels_per_node` etiquetas
+    permanentes; las demás se descartan para acotar el tiempo de búsqueda.
+    """
+    if origin_id not in G or destiny_id not in G:
+        raise nx.NodeNotFound("Origen o destino no existen en el grafo.")
+
+    def allowed(node_id: int) -> bool:
+        if max_concurrency is None:
+            return True
+        conc = int(G.nodes[node_id].get("concurrency", 0) or 0)
+        return conc <= max_concurrency
+
+    # Con max_stops hay que comparar también escalas: una etiqueta con menos
+    # saltos puede ser la única que respete el límite al llegar al destino.
+    use_hops = include_stops or max_stops is not None
+
+    def key(distance: float, cost: float, hops: int) -> tuple:
+        return (distance, cost, hops) if use_hops else (distance, cost)
+
+    # labels[i] = (node, distance, cost, hops, parent_index)
+    labels: list[tuple[int, float, float, int, int]] = []
+    permanent: dict[int, list[tuple]] = {}
+    destiny_labels: list[int] = []
+    heap: list[tuple[float, float, int, int]] = []
+
+    if allowed(origin_id) and allowed(destiny_id):
+        labels.append((origin_id, 0.0, 0.0, 0, -1))
+        heap.append((0.0, 0.0, 0, 0))
+
+    while heap:
+        distance, cost, hops, idx = heapq.heappop(heap)
+        node = labels[idx][0]
+        k = key(distance, cost, hops)
+
+        node_labels = permanent.setdefault(node, [])
+        if len(node_labels) >= max_labels_per_node:
+            continue
+        if any(_dominates(p, k) for p in node_labels):
+            continue
+        if node != destiny_id and any(_dominates(p, k) for p in permanent.get(destiny_id, ())):
+            continue
+        node_labels.append(k)
+
+        if node == destiny_id:
+            destiny_labels.append(idx)
+            continue
+
+        for neighbor, data in G[node].items():
+            if not allowed(neighbor):
+                continue
+            new_hops = hops + 1
+            if max_stops is not None:
+                stops = new_hops - 1 if neighbor == destiny_id else new_hops
+                if stops > max_stops:
+                    continue
+
+            new_distance = distance + float(data["distance"])
+            new_cost = cost + float(data["cost"])
+            new_key = key(new_distance, new_cost, new_hops)
+
+            if any(_dominates(p, new_key) for p in permanent.get(neighbor, ())):
+                continue
+            if any(_dominates(p, new_key) for p in permanent.get(destiny_id, ())):
+                continue
+
+            labels.append((neighbor, new_distance, new_cost, new_hops, idx))
+            heapq.heappush(heap, (new_distance, new_cost, new_hops, len(labels) - 1))
+
+    results: list[tuple[list[int], float, float]] = []
+    for idx in destiny_labels:
+        path = []
+        cur = idx
+        while cur != -1:
+            path.append(labels[cur][0])
+            cur = labels[cur][4]
+        path.reverse()
+        results.append((path, labels[idx][1], labels[idx][2]))
+
+    if not results:
+        raise nx.NetworkXNoPath(
+            f"No se encontró ruta entre {origin_id} y {destiny_id} "
+            f"(max_stops={max_stops}, max_concurrency={max_concurrency})."
+        )
+
+    if use_hops and not include_stops:
+        # Las escalas solo se usaron para respetar max_stops.
+        results = [
+            r for r in results
+            if not any(
+                (o[1], o[2]) != (r[1], r[2]) and _dominates((o[1], o[2]), (r[1], r[2]))
+                for o in results
+            )
+        ]
+
+    results.sort(key=lambda r: (r[1], r[2], len(r[0])))
+    return results
+
+
+def _path_totals(G: nx.Graph, path: list[int]) -> tuple[float, float]:
+    total_distance = 0.0
+    total_cost = 0.0
+    for i in range(len(path) - 1):
+        data = G.get_edge_data(path[i], path[i + 1])
+        total_distance += float(data["distance"])
+        total_cost += float(data["cost"])
+    return total_distance, total_cost
+
+
+def calculate_route_matrix(
+    G: nx.Graph,
+    origin_ids: list[int],
+    destiny_ids: list[int],
+    criteria: str,
+    max_concurrency: Optional[int] = None,
+) -> tuple[list[list[Optional[float]]], list[list[Optional[float]]], list[list[Optional[list[int]]]]]:
+    """
+    Matrices origen x destino de distancia y costo de la mejor ruta según
+    `criteria`, con un Dijkstra de fuente única por origen distinto.
+    Las celdas sin ruta quedan en None.
+    """
+    weight_attr = "cost" if criteria == "cost" else "distance"
+
+    if max_concurrency is not None:
+        allowed = [
+            n for n, data in G.nodes(data=True)
+            if int(data.get("concurrency", 0) or 0) <= max_concurrency
+        ]
+        G = G.subgraph(allowed)
+
+    paths_by_origin: dict[int, dict[int, list[int]]] = {}
+    for origin_id in dict.fromkeys(origin_ids):
+        if origin_id not in G:
+            paths_by_origin[origin_id] = {}
+            continue
+        _, paths = nx.single_source_dijkstra(G, origin_id, weight=weight_attr)
+        paths_by_origin[origin_id] = {d: paths[d] for d in destiny_ids if d in paths}
+
+    distances: list[list[Optional[float]]] = []
+    costs: list[list[Optional[float]]] = []
+    path_rows: list[list[Optional[list[int]]]] = []
+    for origin_id in origin_ids:
+        paths = paths_by_origin[origin_id]
+        dist_row, cost_row, path_row = [], [], []
+        for destiny_id in destiny_ids:
+            path = paths.get(destiny_id)
+            if path is None:
+                dist_row.append(None)
+                cost_row.append(None)
+                path_row.append(None)
+                continue
+            total_distance, total_cost = _path_totals(G, path)
+            dist_row.append(total_distance)
+            cost_row.append(total_cost)
+            path_row.append(path)
+        distances.append(dist_row)
+        costs.append(cost_row)
+        path_rows.append(path_row)
+
+    return distances, costs, path_rows
@@ -0,0 +1,298 @@
+"""
+Snapshot binario del grafo completo (aeropuertos + conexiones).
+
+El archivo se abre con mmap en modo solo lectura, de modo que todos los
+workers comparten las mismas páginas a través de la caché del SO.
+
+Formato (little-endian, versión 1):
+
+    cabecera   : magic "CRGS", version u32, n_nodes u32, n_adj u32
+    ids        : int32[n_nodes]       airport_id ordenado
+    lat, lon   : float64[n_nodes]
+    concurrency: int32[n_nodes]
+    offsets    : int32[n_nodes + 1]   adyacencia CSR
+    neighbors  : int32[n_adj]         índice del nodo vecino
+    distance   : float64[n_adj]
+    cost       : float64[n_adj]
+    congestion : float64[n_adj]
+
+Cada sección empieza alineada a 8 bytes. Cada conexión aparece en la
+adyacencia de sus dos extremos (grafo no dirigido).
+
+Las búsquedas por airport_id se hacen con búsqueda binaria sobre `ids`
+(ordenado), sin copiar la red a diccionarios propios de cada worker.
+"""
+import bisect
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from collections.abc import Iterator, Mapping
+from typing import Optional
+
+import networkx as nx
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from models.airport import Airport
+from models.connection import Connection
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"CRGS"
+SNAPSHOT_VERSION = 1
+_HEADER = struct.Struct("<4sIII")
+
+_snapshot: Optional["GraphSnapshot"] = None
+_snapshot_mtime: Optional[float] = None
+_snapshot_lock = threading.Lock()
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _section_layout(n_nodes: int, n_adj: int) -> list[tuple[str, str, int]]:
+    return [
+        ("ids", "i", n_nodes),
+        ("lat", "d", n_nodes),
+        ("lon", "d", n_nodes),
+        ("concurrency", "i", n_nodes),
+        ("offsets", "i", n_nodes + 1),
+        ("neighbors", "i", n_adj),
+        ("distance", "d", n_adj),
+        ("cost", "d", n_adj),
+        ("congestion", "d", n_adj),
+    ]
+
+
+def write_snapshot(db: Session, path: str) -> tuple[int, int]:
+    """
+    Serializa la red de la BD en `path` (escritura atómica).
+    Devuelve (n_aeropuertos, n_conexiones).
+    """
+    if sys.byteorder != "little":
+        raise RuntimeError("El snapshot solo se genera en plataformas little-endian.")
+
+    airports = (
+        db.query(Airport.id, Airport.lat, Airport.lon, Airport.concurrency)
+        .order_by(Airport.id)
+        .all()
+    )
+    position = {a.id: i for i, a in enumerate(airports)}
+
+    # Igual que nx.Graph: si hay conexiones repetidas gana la última.
+    edges: dict[tuple[int, int], tuple[float, float, float]] = {}
+    connections = db.query(
+        Connection.airport_a_id,
+        Connection.airport_b_id,
+        Connection.distance,
+        Connection.cost,
+        Connection.congestion_factor,
+    ).order_by(Connection.id)
+    for a, b, distance, cost, congestion in connections:
+        if a == b or a not in position or b not in position:
+            continue
+        i, j = position[a], position[b]
+        key = (i, j) if i < j else (j, i)
+        edges[key] = (float(distance), float(cost), float(congestion or 1.0))
+
+    adjacency: list[list[tuple[int, float, float, float]]] = [[] for _ in airports]
+    for (i, j), (distance, cost, congestion) in edges.items():
+        adjacency[i].append((j, distance, cost, congestion))
+        adjacency[j].append((i, distance, cost, congestion))
+
+    sections = {
+        "ids": array("i", (a.id for a in airports)),
+        "lat": array("d", (float(a.lat) for a in airports)),
+        "lon": array("d", (float(a.lon) for a in airports)),
+        "concurrency": array("i", (int(a.concurrency or 0) for a in airports)),
+        "offsets": array("i", [0]),
+        "neighbors": array("i"),
+        "distance": array("d"),
+        "cost": array("d"),
+        "congestion": array("d"),
+    }
+    for adj in adjacency:
+        for j, distance, cost, congestion in adj:
+            sections["neighbors"].append(j)
+            sections["distance"].append(distance)
+            sections["cost"].append(cost)
+            sections["congestion"].append(congestion)
+        sections["offsets"].append(len(sections["neighbors"]))
+
+    n_nodes = len(airports)
+    n_adj = len(sections["neighbors"])
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, n_nodes, n_adj))
+        for name, _, _ in _section_layout(n_nodes, n_adj):
+            fh.write(b"\0" * (_align(fh.tell()) - fh.tell()))
+            sections[name].tofile(fh)
+    os.replace(tmp_path, path)
+
+    return n_nodes, len(edges)
+
+
+class GraphSnapshot:
+    """
+    Vista de solo lectura sobre un snapshot mapeado en memoria.
+    """
+
+    def __init__(self, path: str):
+        if sys.byteorder != "little":
+            raise RuntimeError("El snapshot solo se puede leer en plataformas little-endian.")
+
+        self.path = path
+        with open(path, "rb") as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self._map_sections(path)
+        except ValueError:
+            self._mm.close()
+            raise
+
+        self._airport_index = _SnapshotAirportIndex(self)
+
+    def _map_sections(self, path: str) -> None:
+        if len(self._mm) < _HEADER.size:
+            raise ValueError(f"{path} está truncado (sin cabecera).")
+
+        magic, version, n_nodes, n_adj = _HEADER.unpack_from(self._mm, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} no es un snapshot de grafo.")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(
+                f"Versión de snapshot {version} no soportada (se esperaba {SNAPSHOT_VERSION})."
+            )
+
+        layout = []
+        offset = _HEADER.size
+        for name, fmt, count in _section_layout(n_nodes, n_adj):
+            offset = _align(offset)
+            size = count * struct.calcsize(fmt)
+            layout.append((name, fmt, offset, size))
+            offset += size
+
+        # Un archivo truncado o con basura al final se rechaza entero; si no,
+        # las secciones quedarían cortas sin que nadie lo note.
+        if len(self._mm) != offset:
+            raise ValueError(
+                f"{path} mide {len(self._mm)} bytes; la cabecera indica {offset}."
+            )
+
+        self.n_nodes = n_nodes
+        self.n_adj = n_adj
+
+        view = memoryview(self._mm)
+        for name, fmt, start, size in layout:
+            setattr(self, name, view[start:start + size].cast(fmt))
+
+    def position_of(self, airport_id: int) -> Optional[int]:
+        """Posición de `airport_id` en los arrays, o None si no existe."""
+        i = bisect.bisect_left(self.ids, airport_id)
+        if i < self.n_nodes and self.ids[i] == airport_id:
+            return i
+        return None
+
+    def airport_index(self) -> Mapping[int, tuple[float, float]]:
+        """
+        Mismo formato que graph_service.get_airport_index, leído
+        directamente de los arrays mapeados.
+        """
+        return self._airport_index
+
+    def subgraph(self, subset_ids: set[int]) -> nx.Graph:
+        """
+        Construye el nx.Graph inducido por `subset_ids`, con los mismos
+        atributos de arista que build_graph_for_route.
+        """
+        members = set()
+        for aid in subset_ids:
+            i = self.position_of(aid)
+            if i is not None:
+                members.add(i)
+
+        G = nx.Graph()
+        for i in members:
+            G.add_node(
+                self.ids[i],
+                lat=self.lat[i],
+                lon=self.lon[i],
+                concurrency=self.concurrency[i],
+            )
+        for i in members:
+            for e in range(self.offsets[i], self.offsets[i + 1]):
+                j = self.neighbors[e]
+                if i < j and j in members:
+                    G.add_edge(
+                        self.ids[i],
+                        self.ids[j],
+                        distance=self.distance[e],
+                        cost=self.cost[e],
+                        congestion_factor=self.congestion[e],
+                    )
+        return G
+
+
+class _SnapshotAirportIndex(Mapping):
+    """
+    {airport_id: (lat, lon)} de solo lectura sobre los arrays del snapshot.
+    """
+
+    def __init__(self, snapshot: GraphSnapshot):
+        self._snapshot = snapshot
+
+    def __getitem__(self, airport_id: int) -> tuple[float, float]:
+        i = self._snapshot.position_of(airport_id)
+        if i is None:
+            raise KeyError(airport_id)
+        return self._snapshot.lat[i], self._snapshot.lon[i]
+
+    def __contains__(self, airport_id: object) -> bool:
+        return isinstance(airport_id, int) and self._snapshot.position_of(airport_id) is not None
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._snapshot.ids)
+
+    def __len__(self) -> int:
+        return self._snapshot.n_nodes
+
+    def items(self):
+        snap = self._snapshot
+        return ((aid, (lat, lon)) for aid, lat, lon in zip(snap.ids, snap.lat, snap.lon))
+
+
+def get_graph_snapshot() -> Optional[GraphSnapshot]:
+    """
+    Devuelve el snapshot configurado en GRAPH_SNAPSHOT_PATH, o None si no
+    hay ninguno. Si el archivo se regenera, se vuelve a mapear.
+    """
+    global _snapshot, _snapshot_mtime
+
+    path = settings.GRAPH_SNAPSHOT_PATH
+    if not path:
+        return None
+
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+    if _snapshot is not None and _snapshot_mtime == mtime:
+        return _snapshot
+
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot_mtime != mtime:
+            try:
+                _snapshot = GraphSnapshot(path)
+                _snapshot_mtime = mtime
+            except (ValueError, OSError):
+                logger.exception("No se pudo abrir el snapshot %s", path)
+                return None
+    return _snapshot
@@ -0,0 +1,304 @@
+import csv
+import io
+import time
+import zipfile
+from typing import BinaryIO, Iterator, Union
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import Table, bindparam, insert, select, text, update
+from sqlalchemy.orm import Session
+
+from models.airport import Airport
+from models.connection import Connection
+from schemas.imports import AirportImportRow, ConnectionImportRow, ImportResult
+from services.graph_service import invalidate_airport_index
+
+DEFAULT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 50
+
+Source = Union[str, BinaryIO]
+
+_IMPORT_KINDS: dict[str, tuple[Table, type[BaseModel]]] = {
+    "airports": (Airport.__table__, AirportImportRow),
+    "connections": (Connection.__table__, ConnectionImportRow),
+}
+
+
+def _is_excel(filename: str) -> bool:
+    return filename.lower().endswith((".xlsx", ".xlsm"))
+
+
+def _iter_csv_chunks(source: Source, chunk_size: int) -> Iterator[list[dict]]:
+    import pandas as pd  # import pesado, solo cuando se importa un archivo
+
+    reader = pd.read_csv(
+        source,
+        chunksize=chunk_size,
+        dtype=str,
+        keep_default_na=False,
+        skipinitialspace=True,
+    )
+    with reader:
+        for frame in reader:
+            yield frame.to_dict("records")
+
+
+def _iter_excel_chunks(source: Source, chunk_size: int) -> Iterator[list[dict]]:
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    # read_only recorre la hoja en streaming sin cargarla completa.
+    try:
+        workbook = load_workbook(source, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+        raise ValueError(f"no es un archivo Excel válido ({e})") from e
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(h).strip() if h is not None else "" for h in header]
+
+        chunk: list[dict] = []
+        for values in rows:
+            chunk.append(dict(zip(columns, values)))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        workbook.close()
+
+
+def iter_file_chunks(
+    source: Source,
+    filename: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[list[dict]]:
+    """
+    Lee un CSV o XLSX en bloques de `chunk_size` filas.
+    """
+    if _is_excel(filename):
+        return _iter_excel_chunks(source, chunk_size)
+    return _iter_csv_chunks(source, chunk_size)
+
+
+def _validate_chunk(
+    raw_rows: list[dict],
+    row_model: type[BaseModel],
+    first_line: int,
+    errors: list[str],
+) -> tuple[list[dict], int]:
+    valid: list[dict] = []
+    rejected = 0
+    for offset, raw in enumerate(raw_rows):
+        cleaned = {
+            str(k).strip(): v
+            for k, v in raw.items()
+            if v is not None and v != ""
+        }
+        try:
+            valid.append(row_model.model_validate(cleaned).model_dump())
+        except ValidationError as e:
+            rejected += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                err = e.errors(include_url=False)[0]
+                field = ".".join(str(p) for p in err["loc"])
+                errors.append(f"Fila {first_line + offset}: {field}: {err['msg']}")
+    return valid, rejected
+
+
+def _drop_unknown_airports(
+    db: Session,
+    rows: list[dict],
+    first_line: int,
+    errors: list[str],
+) -> tuple[list[dict], int]:
+    """
+    Descarta conexiones cuyos extremos no existen en Aeropuertos.
+    """
+    referenced = {r["airport_a"] for r in rows} | {r["airport_b"] for r in rows}
+    if not referenced:
+        return rows, 0
+
+    existing = set(
+        db.execute(select(Airport.id).where(Airport.id.in_(referenced))).scalars()
+    )
+    kept: list[dict] = []
+    rejected = 0
+    for r in rows:
+        if r["airport_a"] in existing and r["airport_b"] in existing:
+            kept.append(r)
+            continue
+        rejected += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append(
+                f"Conexión {r['conection_id']}: aeropuerto inexistente "
+                f"({r['airport_a']} -> {r['airport_b']})"
+            )
+    return kept, rejected
+
+
+def _upsert_postgresql(db: Session, table: Table, rows: list[dict]) -> None:
+    """
+    COPY a una tabla temporal y luego INSERT ... ON CONFLICT sobre la real.
+    """
+    key = table.primary_key.columns.values()[0].name
+    columns = [c.name for c in table.columns]
+    tmp = f"tmp_import_{table.name}"
+    col_list = ", ".join(f'"{c}"' for c in columns)
+    set_list = ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in columns if c != key)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for r in rows:
+        writer.writerow(["" if r.get(c) is None else r.get(c) for c in columns])
+    buffer.seek(0)
+
+    raw_connection = db.connection().connection
+    cursor = raw_connection.cursor()
+    try:
+        cursor.execute(
+            f'CREATE TEMP TABLE IF NOT EXISTS "{tmp}" '
+            f'(LIKE "{table.name}" INCLUDING DEFAULTS) ON COMMIT DELETE ROWS'
+        )
+        cursor.copy_expert(
+            f'COPY "{tmp}" ({col_list}) FROM STDIN WITH (FORMAT csv)',
+            buffer,
+        )
+        cursor.execute(
+            f'INSERT INTO "{table.name}" ({col_list}) '
+            f'SELECT {col_list} FROM "{tmp}" '
+            f'ON CONFLICT ("{key}") DO UPDATE SET {set_list}'
+        )
+    finally:
+        cursor.close()
+
+
+def _upsert_sqlite(db: Session, table: Table, rows: list[dict]) -> None:
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+    key = table.primary_key.columns.values()[0].name
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[key],
+        set_={c.name: stmt.excluded[c.name] for c in table.columns if c.name != key},
+    )
+    db.execute(stmt, rows)
+
+
+def _upsert_generic(db: Session, table: Table, rows: list[dict]) -> None:
+    """
+    Para otros motores (p. ej. SQL Server): UPDATE de las filas existentes
+    y INSERT de las nuevas, ambos con executemany.
+    """
+    key_col = table.primary_key.columns.values()[0]
+    key = key_col.name
+    ids = [r[key] for r in rows]
+    existing = set(db.execute(select(key_col).where(key_col.in_(ids))).scalars())
+
+    to_update = [r for r in rows if r[key] in existing]
+    to_insert = [r for r in rows if r[key] not in existing]
+
+    if to_update:
+        stmt = (
+            update(table)
+            .where(key_col == bindparam("b_key"))
+            .values({c.name: bindparam(f"b_{c.name}") for c in table.columns if c.name != key})
+        )
+        db.execute(
+            stmt,
+            [{f"b_{k}" if k != key else "b_key": v for k, v in r.items()} for r in to_update],
+        )
+    if to_insert:
+        db.execute(insert(table), to_insert)
+
+
+def _fix_postgresql_sequence(db: Session, table: Table) -> None:
+    key = table.primary_key.columns.values()[0].name
+    db.execute(
+        text(
+            f"SELECT setval(pg_get_serial_sequence('\"{table.name}\"', '{key}'), "
+            f'COALESCE((SELECT MAX("{key}") FROM "{table.name}"), 1))'
+        )
+    )
+
+
+def _dedupe_by_key(table: Table, rows: list[dict]) -> list[dict]:
+    # Un ON CONFLICT no admite la misma clave dos veces en una sentencia.
+    key = table.primary_key.columns.values()[0].name
+    return list({r[key]: r for r in rows}.values())
+
+
+def import_file(
+    db: Session,
+    kind: str,
+    source: Source,
+    filename: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> ImportResult:
+    """
+    Importa aeropuertos o conexiones desde CSV/XLSX por bloques.
+    Cada bloque se valida, se inserta/actualiza y se confirma, de modo que
+    la memoria usada depende de `chunk_size` y no del tamaño del archivo.
+    """
+    if kind not in _IMPORT_KINDS:
+        raise ValueError(f"Tipo de importación desconocido: {kind}")
+    table, row_model = _IMPORT_KINDS[kind]
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        upsert = _upsert_postgresql
+    elif dialect == "sqlite":
+        upsert = _upsert_sqlite
+    else:
+        upsert = _upsert_generic
+
+    started = time.perf_counter()
+    rows_read = 0
+    rows_imported = 0
+    rows_rejected = 0
+    errors: list[str] = []
+
+    try:
+        for raw_rows in iter_file_chunks(source, filename, chunk_size):
+            # +2: la fila 1 es la cabecera.
+            first_line = rows_read + 2
+            rows_read += len(raw_rows)
+
+            rows, rejected = _validate_chunk(raw_rows, row_model, first_line, errors)
+            rows_rejected += rejected
+
+            if kind == "connections" and rows:
+                rows, rejected = _drop_unknown_airports(db, rows, first_line, errors)
+                rows_rejected += rejected
+
+            if not rows:
+                continue
+
+            rows = _dedupe_by_key(table, rows)
+            upsert(db, table, rows)
+            db.commit()
+            rows_imported += len(rows)
+
+        if dialect == "postgresql" and rows_imported:
+            _fix_postgresql_sequence(db, table)
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if kind == "airports" and rows_imported:
+            invalidate_airport_index()
+
+    elapsed = time.perf_counter() - started
+    return ImportResult(
+        kind=kind,
+        rows_read=rows_read,
+        rows_imported=rows_imported,
+        rows_rejected=rows_rejected,
+        errors=errors,
+        elapsed_seconds=round(elapsed, 3),
+        rows_per_second=round(rows_read / elapsed, 1) if elapsed > 0 else 0.0,
+    )
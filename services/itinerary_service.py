@@ -0,0 +1,210 @@
+import math
+import time
+from typing import NamedTuple, Optional
+
+import networkx as nx
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from services.graph_service import build_graph_for_airports, calculate_route_matrix
+
+
+class ItineraryPlan(NamedTuple):
+    order: list[int]
+    method: str
+    path: list[int]
+    legs: list[tuple[int, int, float, float, list[int]]]
+    total_distance: float
+    total_cost: float
+
+
+def _tour_weight(weights: list[list[float]], order: list[int], closed: bool) -> float:
+    total = sum(weights[order[i]][order[i + 1]] for i in range(len(order) - 1))
+    if closed:
+        total += weights[order[-1]][order[0]]
+    return total
+
+
+def held_karp(weights: list[list[float]], closed: bool) -> list[int]:
+    """
+    Orden óptimo de visita empezando en 0 (programación dinámica sobre
+    subconjuntos, O(n^2 2^n)).
+    """
+    n = len(weights)
+    if n <= 2:
+        return list(range(n))
+
+    m = n - 1  # nodos 1..n-1 -> bits 0..m-1
+    full = (1 << m) - 1
+    dp = [[math.inf] * m for _ in range(1 << m)]
+    parent = [[-1] * m for _ in range(1 << m)]
+
+    for j in range(m):
+        dp[1 << j][j] = weights[0][j + 1]
+
+    for mask in range(1, full + 1):
+        row = dp[mask]
+        for j in range(m):
+            if not (mask >> j) & 1 or row[j] == math.inf:
+                continue
+            base = row[j]
+            for k in range(m):
+                if (mask >> k) & 1:
+                    continue
+                nxt = mask | (1 << k)
+                cand = base + weights[j + 1][k + 1]
+                if cand < dp[nxt][k]:
+                    dp[nxt][k] = cand
+                    parent[nxt][k] = j
+
+    best_j, best = -1, math.inf
+    for j in range(m):
+        cand = dp[full][j] + (weights[j + 1][0] if closed else 0.0)
+        if cand < best:
+            best_j, best = j, cand
+
+    if best_j == -1:
+        return list(range(n))
+
+    order = []
+    mask, j = full, best_j
+    while j != -1:
+        order.append(j + 1)
+        prev = parent[mask][j]
+        mask ^= 1 << j
+        j = prev
+    order.append(0)
+    order.reverse()
+    return order
+
+
+def nearest_neighbour(weights: list[list[float]]) -> list[int]:
+    n = len(weights)
+    order = [0]
+    pending = set(range(1, n))
+    while pending:
+        last = order[-1]
+        nxt = min(pending, key=lambda k: weights[last][k])
+        order.append(nxt)
+        pending.remove(nxt)
+    return order
+
+
+def two_opt(
+    weights: list[list[float]],
+    order: list[int],
+    closed: bool,
+    deadline: float,
+) -> list[int]:
+    """
+    Mejora 2-opt (matriz simétrica) hasta no encontrar mejoras o agotar
+    el tiempo. El primer nodo (inicio del viaje) queda fijo.
+    """
+    order = list(order)
+    n = len(order)
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(1, n - 1):
+            a, b = order[i - 1], order[i]
+            for j in range(i + 1, n):
+                c = order[j]
+                if j + 1 < n:
+                    d = order[j + 1]
+                elif closed:
+                    d = order[0]
+                else:
+                    d = None
+
+                if d is None:
+                    delta = weights[a][c] - weights[a][b]
+                else:
+                    delta = weights[a][c] + weights[b][d] - weights[a][b] - weights[c][d]
+
+                if delta < -1e-9:
+                    order[i:j + 1] = reversed(order[i:j + 1])
+                    improved = True
+                    a, b = order[i - 1], order[i]
+            if time.perf_counter() >= deadline:
+                break
+    return order
+
+
+def solve_visit_order(
+    weights: list[list[float]],
+    closed: bool,
+    exact_max: Optional[int] = None,
+    time_budget_ms: Optional[float] = None,
+) -> tuple[list[int], str]:
+    """
+    Held-Karp exacto hasta `exact_max` aeropuertos; por encima,
+    vecino más cercano + 2-opt dentro de `time_budget_ms`.
+    """
+    if exact_max is None:
+        exact_max = settings.ITINERARY_EXACT_MAX_AIRPORTS
+    if time_budget_ms is None:
+        time_budget_ms = settings.ITINERARY_TIME_BUDGET_MS
+
+    if len(weights) <= exact_max:
+        return held_karp(weights, closed), "held_karp"
+
+    deadline = time.perf_counter() + time_budget_ms / 1000
+    order = two_opt(weights, nearest_neighbour(weights), closed, deadline)
+    return order, "nearest_neighbour_2opt"
+
+
+def plan_itinerary(
+    db: Session,
+    airport_ids: list[int],
+    criteria: str,
+    return_to_start: bool = False,
+    max_concurrency: Optional[int] = None,
+    max_nodes: int = 600,
+) -> ItineraryPlan:
+    """
+    Ordena la visita a `airport_ids` (empezando en el primero) y devuelve
+    el camino completo. Las rutas entre pares salen del mismo motor que
+    /routes/matrix.
+    """
+    airports = list(dict.fromkeys(airport_ids))
+    if len(airports) < 2:
+        raise ValueError("El itinerario necesita al menos dos aeropuertos distintos.")
+
+    G = build_graph_for_airports(db, set(airports), max_nodes=max_nodes)
+    distances, costs, paths = calculate_route_matrix(
+        G,
+        origin_ids=airports,
+        destiny_ids=airports,
+        criteria=criteria,
+        max_concurrency=max_concurrency,
+    )
+
+    metric = costs if criteria == "cost" else distances
+    weights = [[math.inf if v is None else v for v in row] for row in metric]
+
+    order, method = solve_visit_order(weights, closed=return_to_start)
+    if _tour_weight(weights, order, return_to_start) == math.inf:
+        raise nx.NetworkXNoPath(
+            "No existe ruta que conecte todos los aeropuertos del itinerario."
+        )
+
+    stops = list(order) + ([order[0]] if return_to_start else [])
+    legs = []
+    full_path: list[int] = []
+    total_distance = 0.0
+    total_cost = 0.0
+    for i, j in zip(stops, stops[1:]):
+        leg_path = paths[i][j]
+        legs.append((airports[i], airports[j], distances[i][j], costs[i][j], leg_path))
+        total_distance += distances[i][j]
+        total_cost += costs[i][j]
+        full_path.extend(leg_path if not full_path else leg_path[1:])
+
+    return ItineraryPlan(
+        order=[airports[i] for i in order],
+        method=method,
+        path=full_path,
+        legs=legs,
+        total_distance=total_distance,
+        total_cost=total_cost,
+    )
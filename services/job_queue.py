@@ -0,0 +1,297 @@
+"""
+Cola de trabajos de rutas en segundo plano.
+
+Un número fijo de hilos (ROUTE_JOB_WORKERS) ejecuta el mismo pipeline que
+POST /routes/calculate, así las consultas pesadas no ocupan workers HTTP.
+La cola es por proceso: un job solo se puede consultar en el worker que lo
+recibió. Un usuario no puede ocupar más de ROUTE_JOB_MAX_RUNNING_PER_USER
+hilos a la vez (siempre menos que el pool); sus demás jobs esperan aparte
+hasta que uno de los suyos libere el hilo.
+"""
+import itertools
+import logging
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+import networkx as nx
+
+from core.config import settings
+from db.session import SessionLocal
+from models.route import RouteCriteriaEnum
+from models.user import User
+from schemas.route import RouteHistoryItem
+from services.route_service import compute_route, save_route_for_user
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SAVING = "saving"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+JOB_TIMEOUT = "timeout"
+
+FINISHED_STATES = {JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED, JOB_TIMEOUT}
+
+PRIORITY_ORDER = {"high": 0, "normal": 1, "low": 2}
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class UserJobLimitError(Exception):
+    pass
+
+
+class RouteJob:
+    def __init__(self, user_id: int, params: dict, priority: str):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.params = params
+        self.priority = priority
+        self.status = JOB_QUEUED
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.error_status: Optional[int] = None
+        self.done = threading.Event()
+        self._created_monotonic = time.monotonic()
+        self._started_monotonic: Optional[float] = None
+        # True mientras un hilo del pool trabaja en el job, aunque ya se
+        # haya cancelado o vencido (el cálculo no se puede interrumpir).
+        self._running = False
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+
+class RouteJobQueue:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._jobs: dict[str, RouteJob] = {}
+        self._seq = itertools.count()
+        self._threads: list[threading.Thread] = []
+        self._stopping = False
+        # Entradas de la cola apartadas porque su usuario ya tenía el
+        # máximo de jobs en ejecución, por user_id.
+        self._deferred: dict[int, list[tuple]] = {}
+
+    # ---- ciclo de vida -------------------------------------------------
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping = False
+            for i in range(settings.ROUTE_JOB_WORKERS):
+                t = threading.Thread(target=self._worker, name=f"route-job-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            threads, self._threads = self._threads, []
+            self._stopping = True
+        for _ in threads:
+            self._queue.put((-1, next(self._seq), None))
+        for t in threads:
+            t.join(timeout=5)
+
+    # ---- API -----------------------------------------------------------
+
+    def submit(self, user_id: int, params: dict, priority: str = "normal") -> RouteJob:
+        self.start()
+        self._purge_finished()
+
+        with self._lock:
+            active = [j for j in self._jobs.values() if not j.is_finished or j._running]
+            if len(active) >= settings.ROUTE_JOB_MAX_QUEUE:
+                raise QueueFullError("La cola de trabajos está llena.")
+            if sum(1 for j in active if j.user_id == user_id) >= settings.ROUTE_JOB_PER_USER:
+                raise UserJobLimitError(
+                    f"Máximo {settings.ROUTE_JOB_PER_USER} trabajos activos por usuario."
+                )
+
+            job = RouteJob(user_id, params, priority)
+            self._jobs[job.id] = job
+
+        self._queue.put((PRIORITY_ORDER.get(priority, 1), next(self._seq), job.id))
+        return job
+
+    def get(self, job_id: str, user_id: int) -> Optional[RouteJob]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.user_id != user_id:
+                return None
+            self._expire_if_timed_out(job)
+            return job
+
+    def cancel(self, job_id: str, user_id: int) -> Optional[RouteJob]:
+        """
+        Cancela un job en cola o en ejecución. Si ya se está ejecutando,
+        el cálculo termina en segundo plano pero no se guarda. Un job que
+        ya está guardando su resultado no se puede cancelar.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.user_id != user_id:
+                return None
+            if not job.is_finished and job.status != JOB_SAVING:
+                self._finish(job, JOB_CANCELLED, error="Cancelado por el usuario")
+            return job
+
+    # ---- internos ------------------------------------------------------
+
+    def _finish(self, job: RouteJob, status: str, error: Optional[str] = None,
+                error_status: Optional[int] = None, result: Optional[dict] = None) -> None:
+        job.status = status
+        job.error = error
+        job.error_status = error_status
+        job.result = result
+        job.finished_at = datetime.now(timezone.utc)
+        job.done.set()
+
+    def _expire_if_timed_out(self, job: RouteJob) -> None:
+        if job.is_finished or job.status == JOB_SAVING:
+            return
+        now = time.monotonic()
+        reference = job._started_monotonic or job._created_monotonic
+        if now - reference > settings.ROUTE_JOB_TIMEOUT_S:
+            self._finish(job, JOB_TIMEOUT, error="Tiempo máximo de ejecución superado")
+
+    def _purge_finished(self) -> None:
+        limit = datetime.now(timezone.utc).timestamp() - settings.ROUTE_JOB_RESULT_TTL_S
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.is_finished and job.finished_at.timestamp() < limit
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def _max_running_per_user(self) -> int:
+        limit = min(settings.ROUTE_JOB_MAX_RUNNING_PER_USER, settings.ROUTE_JOB_WORKERS - 1)
+        return max(limit, 1)
+
+    def _release_deferred(self, user_id: int) -> None:
+        # Se devuelven todas: alguna puede ser de un job ya cancelado.
+        for entry in self._deferred.pop(user_id, []):
+            self._queue.put(entry)
+
+    def _worker(self) -> None:
+        while True:
+            entry = self._queue.get()
+            job_id = entry[2]
+            if job_id is None:
+                return
+
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                self._expire_if_timed_out(job)
+                if job.is_finished:
+                    continue
+                running = sum(
+                    1 for j in self._jobs.values() if j._running and j.user_id == job.user_id
+                )
+                if running >= self._max_running_per_user():
+                    self._deferred.setdefault(job.user_id, []).append(entry)
+                    continue
+                job.status = JOB_RUNNING
+                job.started_at = datetime.now(timezone.utc)
+                job._started_monotonic = time.monotonic()
+                job._running = True
+
+            try:
+                self._run(job)
+            except Exception:
+                logger.exception("Error inesperado en el job %s", job.id)
+                with self._lock:
+                    if not job.is_finished:
+                        self._finish(job, JOB_FAILED, error="Error interno", error_status=500)
+            finally:
+                with self._lock:
+                    job._running = False
+                    self._release_deferred(job.user_id)
+
+    def _run(self, job: RouteJob) -> None:
+        p = job.params
+        criteria = RouteCriteriaEnum(p["criteria"])
+        db = SessionLocal()
+        try:
+            try:
+                result = compute_route(
+                    db,
+                    origin_id=p["origin_id"],
+                    destiny_id=p["destiny_id"],
+                    criteria=criteria,
+                    max_stops=p.get("max_stops"),
+                    max_concurrency=p.get("max_concurrency"),
+                    max_nodes=p.get("max_nodes", 300),
+                    graph_mode=p.get("graph_mode", "nearest"),
+                    deadline=job._started_monotonic + settings.ROUTE_JOB_TIMEOUT_S,
+                )
+            except TimeoutError:
+                with self._lock:
+                    if not job.is_finished:
+                        self._finish(job, JOB_TIMEOUT, error="Tiempo máximo de ejecución superado")
+                return
+            except ValueError as e:
+                with self._lock:
+                    if not job.is_finished:
+                        self._finish(job, JOB_FAILED, error=str(e), error_status=400)
+                return
+            except nx.NetworkXNoPath as e:
+                with self._lock:
+                    if not job.is_finished:
+                        self._finish(job, JOB_FAILED, error=str(e), error_status=404)
+                return
+            except nx.NodeNotFound:
+                with self._lock:
+                    if not job.is_finished:
+                        self._finish(
+                            job,
+                            JOB_FAILED,
+                            error="Alguno de los aeropuertos indicados no existe en el grafo.",
+                            error_status=404,
+                        )
+                return
+
+            with self._lock:
+                self._expire_if_timed_out(job)
+                if job.is_finished:
+                    # Cancelado o vencido mientras calculaba: no se guarda.
+                    return
+                # A partir de aquí cancel() y el timeout ya no pueden ganar.
+                job.status = JOB_SAVING
+
+            user = db.get(User, job.user_id)
+            route = save_route_for_user(
+                db,
+                user,
+                origin_id=p["origin_id"],
+                destiny_id=p["destiny_id"],
+                criteria=criteria,
+                result=result,
+                max_stops=p.get("max_stops"),
+            )
+            item = RouteHistoryItem.model_validate(route).model_dump(mode="json")
+            with self._lock:
+                if not job.is_finished:
+                    self._finish(job, JOB_SUCCEEDED, result=item)
+        finally:
+            db.close()
+
+
+route_job_queue = RouteJobQueue()
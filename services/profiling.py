@@ -0,0 +1,158 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# cProfile no admite dos perfiladores activos a la vez en el mismo proceso
+# (Python 3.12+); si ya hay uno en marcha la petición se ejecuta sin perfilar.
+_profile_lock = threading.Lock()
+
+# Metadatos que el código perfilado aporta mientras se ejecuta (p. ej. el
+# tamaño del grafo), disponibles aunque la llamada termine en excepción.
+_profile_metadata: ContextVar[Optional[dict]] = ContextVar("profile_metadata", default=None)
+
+_PROFILE_ID_RE = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+_TOP_FUNCTIONS = 25
+
+
+def _new_profile_id() -> str:
+    now = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    return f"{now}-{uuid.uuid4().hex[:8]}"
+
+
+def _prune_old_profiles() -> None:
+    directory = settings.PROFILE_DIR
+    metas = sorted(f for f in os.listdir(directory) if f.endswith(".json"))
+    for meta in metas[: max(len(metas) - settings.PROFILE_MAX_FILES, 0)]:
+        profile_id = meta[: -len(".json")]
+        for ext in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(directory, profile_id + ext))
+            except FileNotFoundError:
+                pass
+
+
+def _save_profile(profiler: cProfile.Profile, metadata: dict) -> str:
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    profile_id = _new_profile_id()
+    base = os.path.join(settings.PROFILE_DIR, profile_id)
+
+    profiler.dump_stats(base + ".prof")
+
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(_TOP_FUNCTIONS)
+
+    metadata = {"id": profile_id, **metadata, "summary": summary.getvalue()}
+    with open(base + ".json", "w", encoding="utf-8") as fh:
+        json.dump(metadata, fh, ensure_ascii=False, default=str)
+
+    _prune_old_profiles()
+    return profile_id
+
+
+def record_profile_metadata(**values: Any) -> None:
+    """
+    Añade datos al perfil en curso; no hace nada si no se está perfilando.
+    """
+    metadata = _profile_metadata.get()
+    if metadata is not None:
+        metadata.update(values)
+
+
+def profile_call(
+    label: str,
+    params: dict,
+    fn: Callable[[], Any],
+    force: bool = False,
+) -> Any:
+    """
+    Ejecuta `fn` bajo cProfile si el perfilado está activo (o `force`) y
+    guarda el perfil cuando la llamada supera PROFILE_SLOW_MS. Lo que `fn`
+    registre con record_profile_metadata se guarda junto al perfil, también
+    si `fn` lanza una excepción.
+    """
+    if not (force or settings.PROFILING_ENABLED):
+        return fn()
+    if not _profile_lock.acquire(blocking=False):
+        return fn()
+
+    profiler = cProfile.Profile()
+    extra: dict = {}
+    token = _profile_metadata.set(extra)
+    started = time.perf_counter()
+    result = None
+    error: Optional[BaseException] = None
+    try:
+        profiler.enable()
+        try:
+            result = fn()
+        except BaseException as e:
+            error = e
+        finally:
+            profiler.disable()
+    finally:
+        _profile_metadata.reset(token)
+        _profile_lock.release()
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if force or elapsed_ms >= settings.PROFILE_SLOW_MS:
+        metadata = {
+            "label": label,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "elapsed_ms": round(elapsed_ms, 1),
+            "forced": force,
+            "params": params,
+            "error": repr(error) if error is not None else None,
+        }
+        metadata.update(extra)
+        try:
+            profile_id = _save_profile(profiler, metadata)
+            logger.info("Perfil %s guardado (%s, %.0f ms)", profile_id, label, elapsed_ms)
+        except OSError:
+            logger.exception("No se pudo guardar el perfil de %s", label)
+
+    if error is not None:
+        raise error
+    return result
+
+
+def list_profiles() -> list[dict]:
+    """
+    Metadatos de los perfiles guardados, del más reciente al más antiguo.
+    """
+    directory = settings.PROFILE_DIR
+    if not os.path.isdir(directory):
+        return []
+
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding="utf-8") as fh:
+                meta = json.load(fh)
+        except (OSError, ValueError):
+            continue
+        meta.pop("summary", None)
+        profiles.append(meta)
+    return profiles
+
+
+def get_profile_path(profile_id: str, ext: str = ".prof") -> Optional[str]:
+    if not _PROFILE_ID_RE.match(profile_id):
+        return None
+    path = os.path.join(settings.PROFILE_DIR, profile_id + ext)
+    return path if os.path.isfile(path) else None
@@ -1,40 +1,176 @@
+import time
+from typing import NamedTuple, Optional
+
+import networkx as nx
 from sqlalchemy.orm import Session
+from core.config import settings
 from decimal import Decimal, ROUND_HALF_UP
 from models.route import RouteCalculated, RouteDetail, RouteCriteriaEnum
-from services.graph_service import build_graph, calculate_shortest_path
+from services.graph_service import build_graph_for_route, calculate_shortest_path
+from services.profiling import record_profile_metadata
+from services.single_flight import SingleFlight
+from services.user_stats_service import record_route_added
 from models.user import User
 
+_route_flight = SingleFlight()
+
+
+class RouteComputation(NamedTuple):
+    path: list[int]
+    total_distance: float
+    total_cost: float
+    avg_concurrency: Optional[float]
+    algorithm: str
+    graph_nodes: int = 0
+    graph_edges: int = 0
+
 
 def round_money(value: float) -> Decimal:
     return Decimal(value).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
 
-def create_route_for_user(
+def compute_route(
     db: Session,
-    user: User,
     origin_id: int,
     destiny_id: int,
     criteria: RouteCriteriaEnum,
-) -> RouteCalculated:
-    G = build_graph(db)
-    path, total_distance, total_cost = calculate_shortest_path(
-        G, origin_id, destiny_id, criteria.value
+    max_stops: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    max_nodes: int = 300,
+    graph_mode: str = "nearest",
+    deadline: Optional[float] = None,
+) -> RouteComputation:
+    """
+    Construye el subgrafo y calcula la mejor ruta, sin escribir historial.
+    En modo "corridor" el corredor se ensancha (CORRIDOR_DETOUR_STEPS)
+    solo si no se encuentra ruta con el anterior.
+    Con `deadline` (time.monotonic()) lanza TimeoutError si se supera entre
+    intentos o durante la búsqueda de candidatos.
+    """
+    if graph_mode == "corridor":
+        detours = settings.CORRIDOR_DETOUR_STEPS
+    else:
+        detours = [None]
+
+    for attempt, detour in enumerate(detours):
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError("Tiempo máximo de cálculo superado")
+        G = build_graph_for_route(
+            db,
+            origin_id=origin_id,
+            destiny_id=destiny_id,
+            max_nodes=max_nodes,
+            mode=graph_mode,
+            detour=detour or 0.0,
+        )
+        record_profile_metadata(
+            graph_nodes=G.number_of_nodes(),
+            graph_edges=G.number_of_edges(),
+            graph_attempts=attempt + 1,
+        )
+        try:
+            path, total_distance, total_cost = calculate_shortest_path(
+                G,
+                origin_id=origin_id,
+                destiny_id=destiny_id,
+                criteria=criteria.value,
+                max_stops=max_stops,
+                max_concurrency=max_concurrency,
+                deadline=deadline,
+            )
+            break
+        except (nx.NetworkXNoPath, nx.NodeNotFound):
+            if attempt == len(detours) - 1:
+                raise
+
+    avg_concurrency = None
+    if path:
+        sum_conc = 0
+        for node_id in path:
+            node_data = G.nodes[node_id]
+            conc = int(node_data.get("concurrency", 0) or 0)
+            sum_conc += conc
+        avg_concurrency = sum_conc / len(path)
+
+    if criteria == RouteCriteriaEnum.COST:
+        algorithm = "bellman_ford"
+    else:
+        algorithm = "dijkstra"
+
+    return RouteComputation(
+        path,
+        total_distance,
+        total_cost,
+        avg_concurrency,
+        algorithm,
+        graph_nodes=G.number_of_nodes(),
+        graph_edges=G.number_of_edges(),
     )
 
+
+def compute_route_shared(
+    db: Session,
+    origin_id: int,
+    destiny_id: int,
+    criteria: RouteCriteriaEnum,
+    max_stops: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    max_nodes: int = 300,
+    graph_mode: str = "nearest",
+) -> RouteComputation:
+    """
+    Igual que compute_route, pero las peticiones concurrentes con los mismos
+    parámetros comparten un único cálculo en curso.
+    """
+    key = (
+        origin_id,
+        destiny_id,
+        criteria.value,
+        max_stops,
+        max_concurrency,
+        max_nodes,
+        graph_mode,
+    )
+    return _route_flight.do(
+        key,
+        lambda: compute_route(
+            db,
+            origin_id=origin_id,
+            destiny_id=destiny_id,
+            criteria=criteria,
+            max_stops=max_stops,
+            max_concurrency=max_concurrency,
+            max_nodes=max_nodes,
+            graph_mode=graph_mode,
+        ),
+    )
+
+
+def save_route_for_user(
+    db: Session,
+    user: User,
+    origin_id: int,
+    destiny_id: int,
+    criteria: RouteCriteriaEnum,
+    result: RouteComputation,
+    max_stops: Optional[int] = None,
+) -> RouteCalculated:
     route = RouteCalculated(
         user_id=user.id,
         origin_id=origin_id,
         destiny_id=destiny_id,
-        total_distance=total_distance,
-        total_cost=round_money(total_cost),
+        total_distance=result.total_distance,
+        total_cost=round_money(result.total_cost),
         criteria=criteria.value,
-        total_stops=max(len(path) - 2, 0),
-        algorithm="dijkstra",
+        total_stops=max(len(result.path) - 2, 0),
+        algorithm=result.algorithm,
+        max_stops=max_stops,
+        avg_concurrency=result.avg_concurrency,
     )
     db.add(route)
     db.flush()  
 
-    for order, airport_id in enumerate(path):
+    for order, airport_id in enumerate(result.path):
         detail = RouteDetail(
             route_id=route.id,
             route_order=order,
@@ -42,6 +178,37 @@ def create_route_for_user(
         )
         db.add(detail)
 
+    record_route_added(db, route)
     db.commit()
     db.refresh(route)
     return route
+
+
+def create_route_for_user(
+    db: Session,
+    user: User,
+    origin_id: int,
+    destiny_id: int,
+    criteria: RouteCriteriaEnum,
+    max_stops: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+    graph_mode: str = "nearest",
+) -> RouteCalculated:
+    result = compute_route_shared(
+        db,
+        origin_id=origin_id,
+        destiny_id=destiny_id,
+        criteria=criteria,
+        max_stops=max_stops,
+        max_concurrency=max_concurrency,
+        graph_mode=graph_mode,
+    )
+    return save_route_for_user(
+        db,
+        user,
+        origin_id=origin_id,
+        destiny_id=destiny_id,
+        criteria=criteria,
+        result=result,
+        max_stops=max_stops,
+    )
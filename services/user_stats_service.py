@@ -0,0 +1,146 @@
+from decimal import Decimal
+
+from sqlalchemy import delete, func, insert, literal, select, union_all, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.airport import Airport
+from models.route import RouteCalculated
+from models.user_stats import UserAirportStats, UserRouteStats
+
+TOP_AIRPORTS = 5
+
+
+def _bump(db: Session, model, key: dict, deltas: dict) -> None:
+    """
+    Suma `deltas` a la fila `key` con un UPDATE atómico; si no existe la
+    crea. Si otra transacción la crea a la vez, se reintenta el UPDATE.
+    Una resta sin fila previa (ruta guardada antes del backfill) se ignora.
+    """
+    where = [getattr(model, k) == v for k, v in key.items()]
+    values = {k: getattr(model, k) + v for k, v in deltas.items()}
+
+    result = db.execute(
+        update(model).where(*where).values(**values),
+        execution_options={"synchronize_session": False},
+    )
+    if result.rowcount:
+        return
+    if any(v < 0 for v in deltas.values()):
+        return
+
+    try:
+        with db.begin_nested():
+            db.execute(insert(model).values(**key, **deltas))
+    except IntegrityError:
+        db.execute(
+            update(model).where(*where).values(**values),
+            execution_options={"synchronize_session": False},
+        )
+
+
+def _apply_route(db: Session, route: RouteCalculated, sign: int) -> None:
+    _bump(
+        db,
+        UserRouteStats,
+        {"user_id": route.user_id},
+        {
+            "route_count": sign,
+            "total_distance": sign * float(route.total_distance),
+            "total_cost": sign * Decimal(str(route.total_cost)),
+            "total_stops": sign * int(route.total_stops or 0),
+        },
+    )
+    for airport_id in (route.origin_id, route.destiny_id):
+        _bump(
+            db,
+            UserAirportStats,
+            {"user_id": route.user_id, "airport_id": airport_id},
+            {"visits": sign},
+        )
+
+
+def record_route_added(db: Session, route: RouteCalculated) -> None:
+    """Actualiza los agregados del usuario dentro de la transacción actual."""
+    _apply_route(db, route, +1)
+
+
+def record_route_removed(db: Session, route: RouteCalculated) -> None:
+    """Revierte la contribución de `route` (llamar antes de borrarla)."""
+    _apply_route(db, route, -1)
+
+
+def get_user_stats(db: Session, user_id: int) -> dict:
+    """
+    Lectura por clave primaria más un top-N sobre el índice (user_id, visits).
+    """
+    stats = db.get(UserRouteStats, user_id)
+    top = (
+        db.query(UserAirportStats.airport_id, Airport.name, UserAirportStats.visits)
+        .join(Airport, Airport.id == UserAirportStats.airport_id)
+        .filter(UserAirportStats.user_id == user_id, UserAirportStats.visits > 0)
+        .order_by(UserAirportStats.visits.desc(), UserAirportStats.airport_id)
+        .limit(TOP_AIRPORTS)
+        .all()
+    )
+
+    route_count = stats.route_count if stats else 0
+    return {
+        "route_count": route_count,
+        "total_distance": float(stats.total_distance) if stats else 0.0,
+        "total_cost": float(stats.total_cost) if stats else 0.0,
+        "avg_stops": (stats.total_stops / route_count) if route_count else 0.0,
+        "top_airports": [
+            {"airport_id": airport_id, "name": name, "visits": visits}
+            for airport_id, name, visits in top
+        ],
+    }
+
+
+def backfill_user_stats(db: Session) -> tuple[int, int]:
+    """
+    Recalcula todos los agregados desde RutasCalculadas.
+    Devuelve (usuarios, filas de aeropuertos).
+    """
+    db.execute(delete(UserAirportStats))
+    db.execute(delete(UserRouteStats))
+
+    totals = db.execute(
+        select(
+            RouteCalculated.user_id,
+            func.count(),
+            func.sum(RouteCalculated.total_distance),
+            func.sum(RouteCalculated.total_cost),
+            func.sum(RouteCalculated.total_stops),
+        ).group_by(RouteCalculated.user_id)
+    ).all()
+    user_rows = [
+        {
+            "user_id": user_id,
+            "route_count": count,
+            "total_distance": float(distance or 0),
+            "total_cost": Decimal(str(cost or 0)),
+            "total_stops": int(stops or 0),
+        }
+        for user_id, count, distance, cost, stops in totals
+    ]
+    if user_rows:
+        db.execute(insert(UserRouteStats), user_rows)
+
+    endpoints = union_all(
+        select(RouteCalculated.user_id.label("user_id"), RouteCalculated.origin_id.label("airport_id")),
+        select(RouteCalculated.user_id.label("user_id"), RouteCalculated.destiny_id.label("airport_id")),
+    ).subquery()
+    visits = db.execute(
+        select(endpoints.c.user_id, endpoints.c.airport_id, func.count(literal(1)))
+        .group_by(endpoints.c.user_id, endpoints.c.airport_id)
+    ).all()
+    airport_rows = [
+        {"user_id": user_id, "airport_id": airport_id, "visits": count}
+        for user_id, airport_id, count in visits
+    ]
+    if airport_rows:
+        db.execute(insert(UserAirportStats), airport_rows)
+
+    db.commit()
+    return len(user_rows), len(airport_rows)